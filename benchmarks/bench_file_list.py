@@ -0,0 +1,42 @@
+"""
+Benchmark get_file_list_full against a local mock API.
+
+Shows the listing cost per page as the number of pages grows. With the
+file list assembled once at the end, the time per page stays flat.
+
+    python benchmarks/bench_file_list.py
+    python benchmarks/bench_file_list.py --pages 1000 5000 20000 --files-per-page 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import deweydatapy as ddp
+from mock_api import MockDeweyServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[100, 1000, 5000, 20000])
+    parser.add_argument('--files-per-page', type=int, default=10)
+    parser.add_argument('--num-workers', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'pages':>8} {'files':>10} {'seconds':>10} {'ms/page':>10}")
+    for total_pages in args.pages:
+        with MockDeweyServer(total_pages=total_pages, files_per_page=args.files_per_page) as server:
+            meta = ddp.get_meta("mock-key", server.product_path, print_meta=False)
+            start = time.perf_counter()
+            files_df, selection_meta, pages_meta = ddp.get_file_list_full(
+                "mock-key", server.product_path, meta=meta, print_info=False,
+                num_workers=args.num_workers)
+            elapsed = time.perf_counter() - start
+        print(f"{total_pages:>8} {files_df.shape[0]:>10} {elapsed:>10.2f} {elapsed / total_pages * 1000:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure the import time of deweydatapy in fresh interpreters.
+
+Each case runs in a new Python process, best of --repeat runs, and reports which
+heavy dependencies (pandas, requests, geopandas) were imported. The "all" case
+imports every public name, as "import deweydatapy" did before the lazy imports.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 10 --json import_times.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('python', "pass"),
+    ('import deweydatapy', "import deweydatapy"),
+    ('DeweyClient', "import deweydatapy as ddp; ddp.DeweyClient"),
+    ('DownloadMetrics', "import deweydatapy as ddp; ddp.DownloadMetrics()"),
+    ('get_file_list', "import deweydatapy as ddp; ddp.get_file_list"),
+    ('all', "from deweydatapy import *"),
+    ('CensusShape', "from deweydatapy.census.census_shape import CensusShape"),
+]
+
+HEAVY_MODULES = ['pandas', 'requests', 'geopandas']
+
+def measure(code):
+    # Seconds to run code in a new interpreter, and the heavy modules it imported
+    script = (f"import sys, time\nstart = time.perf_counter()\n{code}\n"
+              f"seconds = time.perf_counter() - start\n"
+              f"print(seconds, ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    seconds, _, modules = result.stdout.strip().partition(' ')
+    return float(seconds), modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per case; the best is reported.")
+    parser.add_argument('--json', help="Writes the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'case':<20} {'ms':>10}  imported")
+    for name, code in CASES:
+        runs = [measure(code) for _ in range(args.repeat)]
+        times = [seconds for seconds, _ in runs if seconds is not None]
+        modules = runs[-1][1]
+        if not times:
+            print(f"{name:<20} {'-':>10}  {modules}")
+            continue
+        row = {'case': name, 'ms': round(min(times) * 1000, 1), 'imported': modules}
+        results.append(row)
+        print(f"{name:<20} {row['ms']:>10.1f}  {modules}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+Local stand-in for the Dewey files API used by the benchmarks.
+
+Serves the two endpoints deweydatapy talks to:
+
+    /external-api/v3/products/{product_id}/files?page=N
+    /external-api/v3/products/{product_id}/files/metadata
+
+and the listed files themselves under /data/. Each day (partition_key) has one
+page of files, and partition_key_after/partition_key_before select the days.
+Files are gzip CSVs of rows_per_file rows, or filler bytes of file_size_bytes
+when rows_per_file is None, and support Range requests.
+
+latency delays every response and error_rate makes that share of requests fail
+with error_status (and Retry-After: 0), to exercise the retry paths.
+
+Usage:
+
+    server = MockDeweyServer(total_pages=1000, files_per_page=10)
+    server.start()
+    files_df = ddp.get_file_list("any-key", server.product_path, print_info=False)
+    server.stop()
+"""
+import csv
+import gzip
+import io
+import json
+import math
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockDeweyServer:
+    def __init__(self, total_pages=10, files_per_page=10, file_size_bytes=1000000,
+                 product_id="mock-product", host="127.0.0.1", port=0,
+                 rows_per_file=None, latency=0.0, error_rate=0.0, error_status=503, seed=0):
+        """
+        :param total_pages: Number of file list pages (days).
+        :param files_per_page: Number of files listed on each page.
+        :param file_size_bytes: Size of each file when rows_per_file is None.
+        :param product_id: Product ID used in the product path.
+        :param host: Host to bind.
+        :param port: Port to bind. Default is 0 (any free port).
+        :param rows_per_file: Number of rows of the gzip CSV files. Default is None (filler bytes).
+        :param latency: Seconds to wait before each response. Default is 0.
+        :param error_rate: Share of requests answered with error_status. Default is 0.
+        :param error_status: HTTP status of injected errors. Default is 503.
+        :param seed: Seed of the error injection. Default is 0.
+        """
+        self.total_pages = total_pages
+        self.files_per_page = files_per_page
+        self.product_id = product_id
+        self.start_date = date(2020, 1, 1)
+        self.rows_per_file = rows_per_file
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        if rows_per_file is None:
+            self.file_body = bytes(i % 251 for i in range(file_size_bytes))
+        else:
+            self.file_body = make_csv_gz(rows_per_file, seed)
+        self.file_size_bytes = len(self.file_body)
+        self._httpd = _QuietHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def product_path(self):
+        return f"{self.base_url}/external-api/v3/products/{self.product_id}/files"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def total_files(self):
+        return self.total_pages * self.files_per_page
+
+    def partition_key(self, file_number):
+        return (self.start_date + timedelta(days=file_number // self.files_per_page)).isoformat()
+
+    def day_range(self, after=None, before=None):
+        # Days (pages) within partition_key_after and partition_key_before
+        first, last = 0, self.total_pages - 1
+        if after:
+            first = max(first, (date.fromisoformat(after) - self.start_date).days)
+        if before:
+            last = min(last, (date.fromisoformat(before) - self.start_date).days)
+        return range(first, max(first, last + 1))
+
+    def file_name(self, file_number):
+        return f"Mock_Data-{file_number}-DATE-{self.partition_key(file_number)}.csv.gz"
+
+    def should_fail(self):
+        with self._lock:
+            self.request_count += 1
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            if fail:
+                self.error_count += 1
+        return fail
+
+    def metadata(self):
+        return {
+            'total_files': self.total_files,
+            'total_pages': self.total_pages,
+            'total_size': self.total_files * self.file_size_bytes,
+            'expires_at': '2099-12-31T00:00:00+00:00',
+            'partition_aggregation': 'DAY',
+            'partition_column': 'DATE',
+            'min_partition_key': self.partition_key(0),
+            'max_partition_key': self.partition_key(self.total_files - 1),
+        }
+
+    def files_page(self, page, after=None, before=None):
+        days = self.day_range(after, before)
+        total_pages = len(days)
+        total_files = total_pages * self.files_per_page
+        links = []
+        for i in range(self.files_per_page if 1 <= page <= total_pages else 0):
+            file_number = days[page - 1] * self.files_per_page + i
+            file_name = self.file_name(file_number)
+            links.append({
+                'link': f"{self.base_url}/data/{file_name}",
+                'partition_key': self.partition_key(file_number),
+                'file_name': file_name,
+                'file_extension': '.csv.gz',
+                'file_size_bytes': self.file_size_bytes,
+                'modified_at': '2024-01-01T00:00:00+00:00',
+            })
+        return {
+            'page': page,
+            'total_pages': total_pages,
+            'total_files': total_files,
+            'total_size': total_files * self.file_size_bytes,
+            'expires_at': '2099-12-31T00:00:00+00:00',
+            'number_of_files_for_page': len(links),
+            'avg_file_size_for_page': self.file_size_bytes,
+            'partition_column': 'DATE',
+            'download_links': links,
+        }
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients closing streamed downloads early (e.g. read_sample) are expected
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+def make_csv_gz(rows, seed=0):
+    """
+    gzip CSV with a mix of column types, similar to Dewey data files.
+
+    :param rows: Number of rows.
+    :param seed: Random seed.
+    :return: Compressed bytes.
+    """
+    rng = random.Random(seed)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(['PLACEKEY', 'BRANDS', 'CITY', 'REGION', 'RAW_VISIT_COUNTS',
+                     'RAW_VISITOR_COUNTS', 'DISTANCE_FROM_HOME', 'DATE_RANGE_START'])
+    regions = ['CA', 'NY', 'TX', 'FL', 'WA', 'IL']
+    brands = ['Starbucks', 'Walmart', 'Target', '', 'Costco', 'Subway']
+    for i in range(rows):
+        visits = int(math.exp(rng.uniform(0, 8)))
+        writer.writerow([f"zzw-{i:06d}@{rng.randrange(16 ** 6):06x}", rng.choice(brands),
+                         f"City {rng.randrange(500)}", rng.choice(regions), visits,
+                         max(1, visits // rng.randint(1, 4)), round(rng.uniform(100, 50000), 1),
+                         '2023-09-04T00:00:00-04:00'])
+    return gzip.compress(text.getvalue().encode(), compresslevel=6)
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without this, keep-alive
+        # responses stall on delayed ACKs.
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if server.latency:
+                time.sleep(server.latency)
+            if server.should_fail():
+                self.send_response(server.error_status)
+                self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            files_path = f"/external-api/v3/products/{server.product_id}/files"
+
+            if url.path == files_path + "/metadata":
+                self.send_json(server.metadata())
+            elif url.path == files_path:
+                page = int(query.get('page', ['1'])[0])
+                self.send_json(server.files_page(page,
+                                                 query.get('partition_key_after', [None])[0],
+                                                 query.get('partition_key_before', [None])[0]))
+            elif url.path.startswith("/data/"):
+                self.send_file(server.file_body)
+            else:
+                self.send_error(404)
+
+        def send_file(self, body):
+            start, end = 0, len(body)
+            ranged = self.headers.get('Range', '').startswith('bytes=')
+            if ranged:
+                first, _, last = self.headers['Range'][len('bytes='):].partition('-')
+                start = int(first or 0)
+                end = min(end, int(last) + 1) if last else end
+                if start >= len(body):
+                    self.send_response(416)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+            self.send_response(206 if ranged else 200)
+            self.send_header('Content-Type', 'application/gzip')
+            self.send_header('Content-Length', str(end - start))
+            if ranged:
+                self.send_header('Content-Range', f"bytes {start}-{end - 1}/{len(body)}")
+            self.end_headers()
+            view = memoryview(body)[start:end]
+            for offset in range(0, len(view), 1 << 20):
+                self.wfile.write(view[offset:offset + (1 << 20)])
+
+        def send_json(self, obj):
+            body = json.dumps(obj).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
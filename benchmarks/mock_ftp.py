@@ -0,0 +1,282 @@
+"""
+Local stand-in for the Census TIGER FTP site used by CensusShape.download_shapefiles.
+
+Serves a folder over a minimal FTP server (USER/PASS, CWD, PWD, TYPE, PASV,
+NLST, SIZE, REST and RETR), enough for ftplib. make_tiger_tree writes a
+TIGER-like tree of filler zip files:
+
+    {root}/geo/tiger/TIGER{year}/{dataset}/tl_{year}_{state}_{dataset}.zip
+
+drop_transfers makes that many RETR commands close the connection halfway
+through the file, and latency delays every reply, to exercise the retry,
+resume and parallel paths.
+
+Running the module downloads a generated tree with dropped transfers and
+checks that every file arrives complete, for 1 and several workers:
+
+    python benchmarks/mock_ftp.py
+    python benchmarks/mock_ftp.py --states 20 --file-size 2000000 --latency 0.02 --workers 1 4 8
+
+Usage:
+
+    server = MockTigerFTPServer(root, drop_transfers=2).start()
+    cs = CensusShape(local_dir, 2023, ftp_host=server.host, ftp_port=server.port)
+    cs.download_shapefiles(['TRACT'], num_workers=4)
+    server.stop()
+"""
+import argparse
+import contextlib
+import io
+import os
+import posixpath
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+
+def make_tiger_tree(root, year=2023, datasets=('TRACT', 'BG'), states=3, file_size=100000):
+    """
+    Writes filler files named like TIGER shapefiles.
+
+    :param root: Folder served by MockTigerFTPServer.
+    :param year: TIGER year.
+    :param datasets: Dataset folders.
+    :param states: Number of state files per dataset.
+    :param file_size: Size of each file in bytes.
+    :return: List of the file paths relative to root.
+    """
+    paths = []
+    for dataset in datasets:
+        folder = os.path.join(root, 'geo', 'tiger', f'TIGER{year}', dataset)
+        os.makedirs(folder, exist_ok=True)
+        for i in range(states):
+            name = f"tl_{year}_{i + 1:02d}_{dataset.lower()}.zip"
+            with open(os.path.join(folder, name), 'wb') as f:
+                f.write(bytes((i + j) % 251 for j in range(file_size)))
+            paths.append(posixpath.join('geo', 'tiger', f'TIGER{year}', dataset, name))
+    return paths
+
+
+class MockTigerFTPServer:
+    def __init__(self, root, host="127.0.0.1", port=0, drop_transfers=0, latency=0.0):
+        """
+        :param root: Folder served as the FTP root.
+        :param host: Host to bind.
+        :param port: Port to bind. Default is 0 (any free port).
+        :param drop_transfers: Number of RETR commands cut halfway through the file. Default is 0.
+        :param latency: Seconds to wait before each reply. Default is 0.
+        """
+        self.root = os.path.abspath(root)
+        self.drop_transfers = drop_transfers
+        self.latency = latency
+        self.connection_count = 0
+        self.retr_count = 0
+        self.dropped_count = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingTCPServer((host, port), _make_handler(self))
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def should_drop(self):
+        with self._lock:
+            self.retr_count += 1
+            drop = self.dropped_count < self.drop_transfers
+            if drop:
+                self.dropped_count += 1
+        return drop
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing connections (or dropped transfers) are expected
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+def _make_handler(server):
+    class Handler(socketserver.StreamRequestHandler):
+        def setup(self):
+            super().setup()
+            self.cwd = '/'
+            self.rest = 0
+            self.passive = None
+            with server._lock:
+                server.connection_count += 1
+
+        def reply(self, line):
+            if server.latency:
+                time.sleep(server.latency)
+            self.wfile.write((line + "\r\n").encode())
+
+        def local_path(self, path):
+            # Absolute remote path and the matching file under root
+            remote = posixpath.normpath(posixpath.join(self.cwd, path or '.'))
+            return remote, os.path.join(server.root, remote.lstrip('/'))
+
+        def data_connection(self):
+            connection, _ = self.passive.accept()
+            self.passive.close()
+            self.passive = None
+            return connection
+
+        def handle(self):
+            self.reply("220 Mock TIGER FTP")
+            try:
+                for line in self.rfile:
+                    command, _, argument = line.decode().strip().partition(' ')
+                    if not self.command(command.upper(), argument):
+                        break
+            finally:
+                if self.passive is not None:
+                    self.passive.close()
+
+        def command(self, command, argument):
+            if command == 'USER':
+                self.reply("331 Any password")
+            elif command == 'PASS':
+                self.reply("230 Logged in")
+            elif command == 'TYPE':
+                self.reply("200 Type set")
+            elif command == 'PWD':
+                self.reply(f'257 "{self.cwd}"')
+            elif command == 'CWD':
+                remote, path = self.local_path(argument)
+                if os.path.isdir(path):
+                    self.cwd = remote
+                    self.reply("250 Directory changed")
+                else:
+                    self.reply("550 No such directory")
+            elif command == 'PASV':
+                self.passive = socket.socket()
+                self.passive.bind((self.server.server_address[0], 0))
+                self.passive.listen(1)
+                host = self.server.server_address[0].replace('.', ',')
+                port = self.passive.getsockname()[1]
+                self.reply(f"227 Entering Passive Mode ({host},{port >> 8},{port & 255})")
+            elif command == 'SIZE':
+                _, path = self.local_path(argument)
+                if os.path.isfile(path):
+                    self.reply(f"213 {os.path.getsize(path)}")
+                else:
+                    self.reply("550 No such file")
+            elif command == 'REST':
+                self.rest = int(argument)
+                self.reply(f"350 Restarting at {self.rest}")
+            elif command == 'NLST':
+                _, path = self.local_path(argument)
+                if not os.path.isdir(path):
+                    self.reply("550 No such directory")
+                    return True
+                self.reply("150 Listing")
+                with self.data_connection() as connection:
+                    connection.sendall("".join(name + "\r\n" for name in sorted(os.listdir(path))).encode())
+                self.reply("226 Listing completed")
+            elif command == 'RETR':
+                return self.retr(argument)
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return False
+            else:
+                self.reply("502 Not implemented")
+            return True
+
+        def retr(self, argument):
+            _, path = self.local_path(argument)
+            offset, self.rest = self.rest, 0
+            if not os.path.isfile(path):
+                self.reply("550 No such file")
+                return True
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            drop = server.should_drop()
+            self.reply("150 Opening data connection")
+            with self.data_connection() as connection:
+                if drop:
+                    # Half the file, then both connections go away
+                    connection.sendall(data[:len(data) // 2])
+                    return False
+                connection.sendall(data)
+            self.reply("226 Transfer completed")
+            return True
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--states', type=int, default=6, help="State files per dataset.")
+    parser.add_argument('--file-size', type=int, default=500000)
+    parser.add_argument('--drop-transfers', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to each reply.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from deweydatapy.census.census_shape import CensusShape
+
+    work_dir = tempfile.mkdtemp(prefix="dewey_ftp_")
+    try:
+        root = os.path.join(work_dir, "ftp")
+        paths = make_tiger_tree(root, 2023, ('TRACT', 'BG'), args.states, args.file_size)
+        print(f"{len(paths)} files of {args.file_size / 1000000:.2f} MB, "
+              f"{args.drop_transfers} dropped transfers, latency {args.latency} s")
+        print(f"{'workers':>8} {'seconds':>10} {'connections':>12} {'RETR':>6}  check")
+        failed = False
+        for workers in args.workers:
+            local_dir = os.path.join(work_dir, f"local_{workers}")
+            with MockTigerFTPServer(root, drop_transfers=args.drop_transfers, latency=args.latency) as server:
+                cs = CensusShape(local_dir, 2023, ftp_host=server.host, ftp_port=server.port)
+                start = time.perf_counter()
+                # Retries wait 1, 2, 4... seconds, as against the real site
+                with contextlib.redirect_stdout(io.StringIO()):
+                    cs.download_shapefiles(['TRACT', 'BG'], num_workers=workers, timeout=30)
+                seconds = time.perf_counter() - start
+
+            mismatched = []
+            for path in paths:
+                local_file = os.path.join(local_dir, *path.split('/')[3:])
+                with open(os.path.join(root, path), 'rb') as expected:
+                    if not os.path.exists(local_file) or open(local_file, 'rb').read() != expected.read():
+                        mismatched.append(path)
+            failed = failed or bool(mismatched)
+            print(f"{workers:>8} {seconds:>10.3f} {server.connection_count:>12} {server.retr_count:>6}  "
+                  f"{'ok' if not mismatched else f'{len(mismatched)} files missing or different'}")
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark the hot paths of deweydatapy against a local mock API and file server.
+
+Times get_file_list_full, download_files, download_files1, read_sample and
+filter_data with the same generated data, so results can be compared between
+versions and settings. Latency and errors can be injected to measure the
+effect of concurrency and retries.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --pages 20 --files-per-page 10 --rows-per-file 50000 --latency 0.05
+    python benchmarks/run_benchmarks.py --error-rate 0.05 --json results.json
+    python benchmarks/run_benchmarks.py --only file_list download_files
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import deweydatapy as ddp
+from mock_api import MockDeweyServer
+
+BENCHMARKS = ['file_list', 'read_sample', 'download_files', 'download_files1', 'filter_data']
+
+
+def timed(function, repeat, quiet=True):
+    # Best of repeat runs, with the output of the function hidden
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run(args):
+    results = []
+
+    def report(name, workers, seconds, nbytes=None, extra=""):
+        row = {'benchmark': name, 'workers': workers, 'seconds': round(seconds, 4),
+               'MB/s': round(nbytes / seconds / 1000000, 2) if nbytes and seconds > 0 else None}
+        results.append(row)
+        print(f"{name:<18} {workers:>8} {seconds:>10.3f} {row['MB/s'] if row['MB/s'] is not None else '-':>10} {extra}")
+        sys.stdout.flush()
+
+    server = MockDeweyServer(total_pages=args.pages, files_per_page=args.files_per_page,
+                             rows_per_file=args.rows_per_file, latency=args.latency,
+                             error_rate=args.error_rate)
+    work_dir = tempfile.mkdtemp(prefix="dewey_bench_")
+    with server:
+        apikey = "mock-key"
+        product_path = server.product_path
+        total_bytes = server.total_files * server.file_size_bytes
+        print(f"{server.total_files:,} files of {server.file_size_bytes / 1000000:.2f} MB "
+              f"in {args.pages:,} pages, latency {args.latency} s, error rate {args.error_rate}")
+        print(f"{'benchmark':<18} {'workers':>8} {'seconds':>10} {'MB/s':>10}")
+
+        meta = ddp.get_meta(apikey, product_path, print_meta=False)
+        files_df = ddp.get_file_list(apikey, product_path, meta=meta, print_info=False)
+
+        if 'file_list' in args.only:
+            for workers in args.workers:
+                seconds, _ = timed(lambda: ddp.get_file_list_full(
+                    apikey, product_path, meta=meta, print_info=False, num_workers=workers), args.repeat)
+                report('file_list', workers, seconds, extra=f"{seconds / args.pages * 1000:.2f} ms/page")
+
+        if 'read_sample' in args.only:
+            seconds, sample = timed(lambda: ddp.read_sample(files_df['link'][0], nrows=args.sample_rows),
+                                    args.repeat)
+            report('read_sample', 1, seconds, extra=f"{sample.shape[0]:,} rows")
+
+        data_folder = os.path.join(work_dir, "data")
+        if 'download_files' in args.only:
+            for workers in args.workers:
+                def download():
+                    shutil.rmtree(data_folder, ignore_errors=True)
+                    return ddp.download_files(files_df.copy(), data_folder, num_workers=workers)
+                seconds, metrics = timed(download, args.repeat)
+                summary = metrics.summary()
+                report('download_files', workers, seconds, total_bytes,
+                       f"{summary['retries']} retries, {summary['failed']} failed")
+
+        if 'download_files1' in args.only:
+            for workers in args.workers:
+                def download1():
+                    shutil.rmtree(data_folder, ignore_errors=True)
+                    return ddp.download_files1(apikey, product_path, data_folder, num_workers=workers)
+                seconds, metrics = timed(download1, args.repeat)
+                summary = metrics.summary()
+                report('download_files1', workers, seconds, total_bytes,
+                       f"listing {summary['listing_seconds']:.2f} s, {summary['retries']} retries")
+
+        if 'filter_data' in args.only and args.rows_per_file is not None:
+            if not os.path.isdir(data_folder):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    ddp.download_files(files_df.copy(), data_folder, num_workers=max(args.workers))
+            output_path = os.path.join(work_dir, "filtered.csv")
+            for workers in args.workers:
+                seconds, _ = timed(lambda: ddp.filter_data(
+                    data_folder, output_path, query="RAW_VISIT_COUNTS > 100 and REGION == 'CA'",
+                    columns=['PLACEKEY', 'RAW_VISIT_COUNTS'], num_workers=workers), args.repeat)
+                report('filter_data', workers, seconds, total_bytes)
+
+        print(f"{server.request_count:,} requests, {server.error_count:,} injected errors")
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--files-per-page', type=int, default=4)
+    parser.add_argument('--rows-per-file', type=int, default=20000,
+                        help="Rows of each generated csv.gz file. 0 serves filler bytes instead.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to each response.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests that fail with 503.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--sample-rows', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per benchmark; the best is reported.")
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--json', help="Writes the results to this file.")
+    args = parser.parse_args()
+    if args.rows_per_file == 0:
+        args.rows_per_file = None
+
+    results = run(args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,40 @@
-from .download import *
+import importlib
 
-message = "Dewey Data Inc."
\ No newline at end of file
+# Public names and the modules defining them. Modules are imported on first
+# access (PEP 562), so "import deweydatapy" does not import pandas or requests
+# until a function that needs them is used.
+__lazy_names = {
+    'download': [
+        'DATE_PATTERN', 'DOWNLOAD_CHUNK_SIZE', 'FILE_LIST_COLUMNS', 'GZIP_MAGIC',
+        'MANIFEST_FILE_NAME', 'OUTPUT_FORMATS', 'PAGES_META_COLUMNS', 'SAMPLE_READ_BUFFER_SIZE',
+        'SYNC_STATE_FILE_NAME', 'DEFAULT_PARTITION', 'PARTITION_COLUMN',
+        'get_meta', 'print_selection_meta', 'get_file_list_full', 'get_file_list',
+        'read_sample', 'read_sample0', 'read_sample_data', 'read_sample_data0',
+        'download_files', 'download_files0', 'download_files1', 'sync_files', 'slice_files_df',
+        'read_local', 'read_local_data', 'infer_dtypes', 'filter_data',
+    ],
+    'dataset': ['convert_to_parquet', 'DeweyDataset'],
+    'async_download': ['AsyncDeweyClient', 'async_get_meta', 'async_get_file_list_full',
+                       'async_get_file_list', 'async_read_sample', 'async_download_files'],
+    'client': ['DeweyClient', 'TransferLimiter', 'get_client', 'set_client'],
+    'cache': ['ResponseCache', 'enable_cache', 'disable_cache', 'get_cache'],
+    'metrics': ['DownloadMetrics'],
+}
+__name_modules = {name: module for module, names in __lazy_names.items() for name in names}
+__submodules = ['async_download', 'cache', 'census', 'client', 'dataset', 'download', 'metrics']
+
+__all__ = list(__name_modules) + ['message']
+
+message = "Dewey Data Inc."
+
+def __getattr__(name):
+    if name in __name_modules:
+        value = getattr(importlib.import_module('.' + __name_modules[name], __name__), name)
+        globals()[name] = value
+        return value
+    if name in __submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(__name_modules) | set(__submodules))
@@ -0,0 +1,435 @@
+import asyncio
+import os
+import sys
+import time
+import zlib
+from io import BytesIO
+
+import pandas as pd
+
+from .cache import get_cache
+from .client import DeweyClient, get_client
+from .download import (DOWNLOAD_CHUNK_SIZE, GZIP_MAGIC, _DownloadManifest, _DownloadProgress,
+                       _assemble_file_list, _file_list_params, _make_api_endpoint, _make_meta,
+                       _prepare_dest_folder, _selection_meta, print_selection_meta)
+from .metrics import DownloadMetrics
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("The async functions require aiohttp. Install it with: pip install aiohttp")
+    return aiohttp
+
+class AsyncDeweyClient:
+    """
+    asyncio counterpart of DeweyClient used by the async_* functions.
+
+    Owns one aiohttp session with a connection pool shared by all requests
+    made from an event loop, and retries connection errors, timeouts and
+    retryable status codes with exponential backoff, honoring Retry-After.
+
+    Example:
+        async with ddp.AsyncDeweyClient(pool_size=200) as client:
+            files_df = await ddp.async_get_file_list(apikey, product_path, client=client)
+            await ddp.async_download_files(files_df, "C:/Temp", num_workers=200, client=client)
+    """
+    def __init__(self, pool_size=100, timeout=(10, 300), max_retries=5,
+                 backoff_factor=1.0, max_backoff=60,
+                 retry_statuses=(429, 500, 502, 503, 504), limiter=None):
+        """
+        :param pool_size: Maximum number of open connections. Default is 100.
+        :param timeout: Connect and read timeout in seconds, a number or a (connect, read) tuple. Default is (10, 300).
+        :param max_retries: Maximum number of retries of a request. Default is 5.
+        :param backoff_factor: Base delay in seconds of the exponential backoff. Default is 1.0.
+        :param max_backoff: Maximum delay in seconds between retries. Default is 60.
+        :param retry_statuses: HTTP status codes that are retried. Default is (429, 500, 502, 503, 504).
+        :param limiter: TransferLimiter for file downloads. Default is None (the limiter of get_client(), shared with the blocking functions).
+        """
+        self.aiohttp = _import_aiohttp()
+        self.limiter = limiter
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+        self.session = None
+
+    # Same retry policy as the blocking client
+    backoff = DeweyClient.backoff
+    retry_after = DeweyClient.retry_after
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            self.session = self.aiohttp.ClientSession(
+                connector=self.aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read))
+        return self.session
+
+    async def get(self, url, params=None, headers=None, on_retry=None):
+        """
+        Sends a GET request, retrying transient failures.
+        The response body is not read; release the response (async with) when done.
+
+        :param url: URL.
+        :param params: Query parameters.
+        :param headers: Request headers.
+        :param on_retry: Function called with the attempt number and the error before each retry. Default is None.
+        :return: An aiohttp.ClientResponse object.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = await self.get_session().get(url, params=params, headers=headers)
+            except (self.aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                error = e
+            else:
+                if response.status not in self.retry_statuses or attempt >= self.max_retries:
+                    return response
+                delay = self.retry_after(response)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                error = f"HTTP {response.status}"
+                response.release()
+            if on_retry is not None:
+                on_retry(attempt, error)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+async def __with_client(client, coroutine_function):
+    # Runs coroutine_function(client) with a temporary client if none is given
+    if client is not None:
+        return await coroutine_function(client)
+    async with AsyncDeweyClient() as client:
+        return await coroutine_function(client)
+
+async def __get_json(client, apikey, url, params, required_key):
+    cache = get_cache()
+    if cache is not None:
+        cache_key = cache.key(url, params, apikey)
+        res_json = cache.get(cache_key)
+        if res_json is not None:
+            return res_json
+
+    try:
+        async with await client.get(url, params=params,
+                                    headers={'X-API-KEY': apikey,
+                                             'accept': 'application/json'}) as response:
+            if response.status in (401, 422):
+                print(response)
+                return None
+            res_json = await response.json(content_type=None)
+    except Exception as e:
+        print("Error in requests.get")
+        print(e)
+        print(" ")
+        return None
+
+    if required_key not in res_json:
+        print("Error in response.json")
+        print(res_json)
+        print(" ")
+        return None
+
+    if cache is not None:
+        cache.set(cache_key, res_json)
+    return res_json
+
+async def async_get_meta(apikey, product_path, print_meta=True, client=None):
+    """
+    Collects the meta information from data server. Async version of get_meta.
+
+    :param apikey: API Key.
+    :param product_path: API endpoint or Product ID.
+    :param print_meta: Print meta information. Default is True.
+    :param client: AsyncDeweyClient to use. Default is None (a temporary client).
+    :return: A dict object contains meta information.
+    """
+    product_path = _make_api_endpoint(product_path)
+
+    async def run(client):
+        res_json = await __get_json(client, apikey, product_path + "/metadata", None, 'total_files')
+        if res_json is None:
+            return None
+        return _make_meta(res_json, print_meta)
+
+    return await __with_client(client, run)
+
+async def async_get_file_list_full(apikey, product_path, start_page=1, end_page=float('inf'),
+                                   start_date=None, end_date=None,
+                                   meta=None,
+                                   print_info=True,
+                                   num_workers=16,
+                                   client=None):
+    """
+    Collects the file list information from data server. Async version of get_file_list_full.
+
+    :param apikey: API Key.
+    :param product_path: API endpoint or Product ID.
+    :param start_page: Start page of file list. Default is 1.
+    :param end_page: End page of file list. Default is Inf.
+    :param start_date: Data start date character for files in the form of '2021-07-01'. Default is None ("1000-01-01"), which indicates no limit.
+    :param end_date: Data end date character for files in the form of '2023-08-21'. Default is None ('9999-12-31'), which indicates no limit.
+    :param meta: Meta information from get_meta. Default is None (collected).
+    :param print_info: Print file list information. Default is True.
+    :param num_workers: Maximum number of pages requested concurrently. Default is 16.
+    :param client: AsyncDeweyClient to use. Default is None (a temporary client).
+    :return: DataFrame object contains files information, selection meta and pages meta.
+    """
+    product_path = _make_api_endpoint(product_path)
+
+    async def run(client):
+        nonlocal meta
+        if meta is None:
+            meta = await async_get_meta(apikey, product_path, print_meta=False, client=client)
+            if meta is None:
+                return None
+        params_ = _file_list_params(meta, start_date, end_date)
+
+        async def fetch(page):
+            return await __get_json(client, apikey, product_path, dict(params_, page=page), 'page')
+
+        res_json = await fetch(start_page)
+        if res_json is None:
+            return None
+        selection_meta = _selection_meta(res_json)
+        last_page = int(min(res_json['total_pages'], end_page))
+
+        semaphore = asyncio.Semaphore(max(1, int(num_workers)))
+
+        async def fetch_limited(page):
+            async with semaphore:
+                page_json = await fetch(page)
+            if page_json is not None and print_info:
+                print(f"Collecting files information for page {page}/{page_json['total_pages']}...")
+                sys.stdout.flush()
+            return page_json
+
+        if print_info:
+            print(f"Collecting files information for page {res_json['page']}/{res_json['total_pages']}...")
+        pages = list(range(res_json['page'] + 1, last_page + 1))
+        page_jsons = await asyncio.gather(*[fetch_limited(page) for page in pages])
+        if any(page_json is None for page_json in page_jsons):
+            return None
+        page_jsons = dict(zip(pages, page_jsons))
+        page_jsons[res_json['page']] = res_json
+
+        files_df, pages_meta = _assemble_file_list(page_jsons)
+        # Backward compatibility
+        files_df['download_link'] = files_df['link']
+        files_df.insert(loc=0, column='index', value=range(0, files_df.shape[0]))
+
+        if print_info:
+            print("Files information collection completed.")
+            print(" ")
+            print_selection_meta(selection_meta, pages_meta)
+        return files_df, selection_meta, pages_meta
+
+    return await __with_client(client, run)
+
+async def async_get_file_list(apikey, product_path, start_page=1, end_page=float('inf'),
+                              start_date=None, end_date=None,
+                              meta=None,
+                              print_info=True,
+                              num_workers=16,
+                              client=None):
+    """
+    Collects the file list information from data server. Async version of get_file_list.
+
+    :param apikey: API Key.
+    :param product_path: API endpoint or Product ID.
+    :param start_page: Start page of file list. Default is 1.
+    :param end_page: End page of file list. Default is Inf.
+    :param start_date: Data start date character for files in the form of '2021-07-01'. Default is None ("1000-01-01"), which indicates no limit.
+    :param end_date: Data end date character for files in the form of '2023-08-21'. Default is None ('9999-12-31'), which indicates no limit.
+    :param meta: Meta information from get_meta. Default is None (collected).
+    :param print_info: Print file list information. Default is True.
+    :param num_workers: Maximum number of pages requested concurrently. Default is 16.
+    :param client: AsyncDeweyClient to use. Default is None (a temporary client).
+    :return: A DataFrame object contains files information.
+    """
+    result = await async_get_file_list_full(apikey, product_path, start_page, end_page,
+                                            start_date, end_date, meta, print_info,
+                                            num_workers, client)
+    if result is None:
+        return None
+    return result[0]
+
+async def async_read_sample(url, nrows=100, client=None):
+    """
+    Read sample data into memory from a URL. Async version of read_sample.
+    Stops downloading once nrows rows are received.
+
+    :param url: A file URL.
+    :param nrows: Number of rows to read. Default is 100.
+    :param client: AsyncDeweyClient to use. Default is None (a temporary client).
+    :return: A DataFrame object contains data.
+    """
+    async def run(client):
+        data = BytesIO()
+        decompressor = None
+        async with await client.get(url) as response:
+            eof = False
+            while True:
+                chunk = await response.content.read(64 * 1024)
+                if not chunk:
+                    eof = True
+                elif decompressor is None and data.tell() == 0 and chunk[:2] == GZIP_MAGIC:
+                    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+                if chunk:
+                    data.write(decompressor.decompress(chunk) if decompressor is not None else chunk)
+                # Header plus nrows lines received (quoted line breaks may need more)
+                if eof or data.getvalue().count(b'\n') > nrows + 1:
+                    try:
+                        df = pd.read_csv(BytesIO(data.getvalue()), nrows=nrows)
+                    except Exception:
+                        if eof:
+                            print("Could not read the data. Can only open gzip csv file or csv file.")
+                            return None
+                        continue
+                    if eof or df.shape[0] >= nrows:
+                        return df
+
+    return await __with_client(client, run)
+
+async def __download_file(client, link, dest_path, expected_size, resume, chunk_size,
+                          on_retry=None, stats=None):
+    # Streams one file into dest_path.part and renames it on completion,
+    # resuming an existing .part file with a Range request.
+    part_path = dest_path + ".part"
+    offset = 0
+    if resume and os.path.exists(part_path):
+        offset = os.path.getsize(part_path)
+        if expected_size is not None and offset > expected_size:
+            offset = 0
+
+    nbytes = 0
+    if expected_size is None or offset < expected_size:
+        headers = {'Range': f'bytes={offset}-'} if offset > 0 else None
+        limiter = client.limiter if client.limiter is not None else get_client().limiter
+        async with limiter.async_transfer_slot():
+            requested = time.perf_counter()
+            async with await client.get(link, headers=headers, on_retry=on_retry) as response:
+                if stats is not None:
+                    stats['latency'] = time.perf_counter() - requested
+                range_failed = response.status == 416
+                if not range_failed:
+                    response.raise_for_status()
+                    if response.status != 206:
+                        offset = 0
+                    with open(part_path, 'ab' if offset > 0 else 'wb') as f:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            f.write(chunk)
+                            nbytes += len(chunk)
+                            delay = limiter.reserve(len(chunk))
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+        if range_failed:
+            os.remove(part_path)
+            return await __download_file(client, link, dest_path, expected_size, False, chunk_size,
+                                         on_retry, stats)
+
+    size = offset + nbytes
+    if expected_size is not None and size != expected_size:
+        os.remove(part_path)
+        raise IOError(f"Size mismatch for {dest_path}: expected {expected_size:,} bytes, got {size:,} bytes.")
+
+    os.replace(part_path, dest_path)
+    return nbytes, size
+
+async def async_download_files(files_df, dest_folder, filename_prefix=None, skip_exists=False,
+                               num_workers=16, resume=True, client=None, metrics=None):
+    """
+    Download files from file list to a destination folder. Async version of download_files.
+
+    :param files_df: File list collected from get_file_list.
+    :param dest_folder: Destination local folder to save files.
+    :param filename_prefix: Prefix for file names.
+    :param skip_exists: Skips downloading if the file exists and its size matches file_size_bytes. Default is False.
+    :param num_workers: Number of files downloaded concurrently, limited by the pool_size of the client. Default is 16.
+    :param resume: Resumes partially downloaded (.part) files from where they stopped. Default is True.
+    :param client: AsyncDeweyClient to use. Default is None (a temporary client).
+    :param metrics: DownloadMetrics object to record into. Default is None (a new one).
+    :return: A DownloadMetrics object with the timings of the download.
+    """
+    dest_folder = _prepare_dest_folder(dest_folder)
+    if metrics is None:
+        metrics = DownloadMetrics()
+    if filename_prefix is None:
+        filename_prefix = ""
+    manifest = _DownloadManifest(dest_folder)
+
+    jobs = files_df.reset_index(drop=True).to_dict('records')
+    total_bytes = None
+    if 'file_size_bytes' in files_df.columns:
+        total_bytes = int(files_df['file_size_bytes'].sum())
+    progress = _DownloadProgress(len(jobs), total_bytes)
+
+    async def run(client):
+        semaphore = asyncio.Semaphore(max(1, int(num_workers)))
+
+        async def download(job):
+            file_name = filename_prefix + job['file_name']
+            dest_path = dest_folder + file_name
+            expected_size = job.get('file_size_bytes')
+            expected_size = None if expected_size is None or pd.isna(expected_size) else int(expected_size)
+
+            if skip_exists and os.path.exists(dest_path):
+                size = os.path.getsize(dest_path)
+                if expected_size is None or size == expected_size:
+                    print(f"File already exists: {dest_path}")
+                    if manifest.get(file_name).get('status') != 'completed':
+                        manifest.update(file_name, link=job['link'], partition_key=job.get('partition_key'),
+                                        expected_size=expected_size, bytes_written=size, status='completed')
+                    metrics.file_finished(file_name, job['link'], 'skipped', size=size)
+                    print(progress.update(size, skipped=True))
+                    return
+
+            async with semaphore:
+                manifest.update(file_name, link=job['link'], partition_key=job.get('partition_key'),
+                                expected_size=expected_size, bytes_written=0, status='downloading')
+                metrics.file_started(file_name, job['link'])
+                stats = {'retries': 0, 'latency': None}
+                started = time.perf_counter()
+
+                def on_retry(attempt, error):
+                    stats['retries'] += 1
+                    metrics.file_retry(file_name, job['link'], attempt, error)
+
+                try:
+                    nbytes, size = await __download_file(client, job['link'], dest_path,
+                                                         expected_size, resume, DOWNLOAD_CHUNK_SIZE,
+                                                         on_retry, stats)
+                except Exception as e:
+                    manifest.update(file_name, status='failed')
+                    metrics.file_finished(file_name, job['link'], 'failed',
+                                          seconds=time.perf_counter() - started, latency=stats['latency'],
+                                          retries=stats['retries'], error=e)
+                    print(f"Error downloading {job['file_name']}: {e}")
+                    return
+            manifest.update(file_name, bytes_written=size, status='completed')
+            metrics.file_finished(file_name, job['link'], 'completed', nbytes, size,
+                                  time.perf_counter() - started, stats['latency'], stats['retries'])
+            print(f"Downloaded {dest_path}")
+            print(progress.update(nbytes))
+            sys.stdout.flush()
+
+        await asyncio.gather(*[download(job) for job in jobs])
+
+    await __with_client(client, run)
+    return metrics
@@ -0,0 +1,162 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+class ResponseCache:
+    """
+    Cache of API responses (metadata and file list pages).
+
+    Keeps an in-memory LRU and optionally an on-disk store shared between
+    sessions. An entry expires expiry_margin seconds before the expires_at
+    returned with it, so cached download links are never used after they expire.
+    Responses without expires_at are kept for default_ttl seconds.
+
+    Example:
+        ddp.enable_cache(cache_dir="C:/Temp/dewey_cache")
+    """
+    def __init__(self, maxsize=256, cache_dir=None, default_ttl=3600, expiry_margin=3600):
+        """
+        :param maxsize: Maximum number of responses kept in memory. Default is 256.
+        :param cache_dir: Folder of the on-disk store. Default is None (memory only).
+        :param default_ttl: Seconds to keep responses without expires_at. Default is 3600.
+        :param expiry_margin: Seconds before expires_at at which an entry expires. Default is 3600.
+        """
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.expiry_margin = expiry_margin
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, url, params, apikey):
+        """
+        Cache key of a request: the product path with its date window and page, and the API key.
+
+        :param url: Request URL.
+        :param params: Query parameters.
+        :param apikey: API Key.
+        :return: A key string.
+        """
+        apikey_hash = hashlib.sha256(apikey.encode()).hexdigest()
+        request = json.dumps([url, sorted((params or {}).items()), apikey_hash], default=str)
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        :param key: A key from key().
+        :return: A copy of the cached response or None if missing or expired.
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    return copy.deepcopy(entry[1])
+                del self.entries[key]
+
+        if self.cache_dir is None:
+            return None
+        path = os.path.join(self.cache_dir, key + ".json")
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires'] <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        self.__remember(key, entry['expires'], entry['value'])
+        return copy.deepcopy(entry['value'])
+
+    def set(self, key, value):
+        """
+        :param key: A key from key().
+        :param value: A response json.
+        """
+        expires = self.expires(value)
+        if expires <= time.time():
+            return
+        self.__remember(key, expires, copy.deepcopy(value))
+
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, key + ".json")
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'expires': expires, 'value': value}, f)
+            os.replace(tmp_path, path)
+
+    def expires(self, value):
+        """
+        :param value: A response json.
+        :return: Expiry time of the response in seconds since the epoch.
+        """
+        expires_at = value.get('expires_at') if isinstance(value, dict) else None
+        if expires_at:
+            try:
+                expires_at = datetime.fromisoformat(str(expires_at).replace('Z', '+00:00'))
+                if expires_at.tzinfo is None:
+                    expires_at = expires_at.replace(tzinfo=timezone.utc)
+                return expires_at.timestamp() - self.expiry_margin
+            except ValueError:
+                pass
+        return time.time() + self.default_ttl
+
+    def clear(self):
+        """
+        Removes all entries from memory and disk.
+        """
+        with self.lock:
+            self.entries.clear()
+        if self.cache_dir is not None:
+            for file in os.listdir(self.cache_dir):
+                if file.endswith(".json"):
+                    os.remove(os.path.join(self.cache_dir, file))
+
+    def __remember(self, key, expires, value):
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+__cache = None
+
+def enable_cache(maxsize=256, cache_dir=None, default_ttl=3600, expiry_margin=3600):
+    """
+    Caches metadata and file list responses of get_meta and get_file_list.
+    Repeated listings of the same product, date range and page are served locally
+    until the links they contain are about to expire.
+
+    :param maxsize: Maximum number of responses kept in memory. Default is 256.
+    :param cache_dir: Folder to also store responses on disk. Default is None (memory only).
+    :param default_ttl: Seconds to keep responses without expires_at. Default is 3600.
+    :param expiry_margin: Seconds before expires_at at which a response is no longer used. Default is 3600.
+    :return: A ResponseCache object.
+    """
+    global __cache
+    __cache = ResponseCache(maxsize, cache_dir, default_ttl, expiry_margin)
+    return __cache
+
+def disable_cache():
+    """
+    Stops caching API responses.
+    """
+    global __cache
+    __cache = None
+
+def get_cache():
+    """
+    :return: The ResponseCache object in use or None if caching is disabled.
+    """
+    return __cache
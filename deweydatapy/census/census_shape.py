@@ -1,21 +1,53 @@
 # https://www.census.gov/geographies/mapping-files/time-series/geo/tiger-line-file.html
 
-import geopandas as gpd
+# geopandas, numpy and pandas are imported by the methods using them,
+# so downloading shapefiles does not import them
 import us
-# import pandas as pd
 # from geopy.geocoders import Nominatim
 
-from ftplib import FTP
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import json
+from ftplib import FTP, all_errors, error_perm
 import os
+import posixpath
+import queue
+import threading
+import time
 
 # FTP site details
 TIGER_FTP_HOST = 'ftp2.census.gov'
 TIGER_FTP_DIR_PREFIX = '/geo/tiger/TIGER'
 
+# Downloaded shapefiles are converted once to GeoParquet files in local_dir/_geoparquet
+GEOPARQUET_DIR = '_geoparquet'
+# Number of GeoDataFrames kept in memory by the read_* methods
+SHAPEFILE_CACHE_SIZE = 16
+
+_shapefile_cache = OrderedDict()
+_shapefile_cache_lock = threading.Lock()
+# Layers of CensusShape.tag_points kept by each worker process
+_tag_worker_layers = {}
+
+class _LocalFileError(Exception):
+    """
+    Writing a downloaded file failed locally, as opposed to a dropped connection.
+    """
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+def clear_shapefile_cache():
+    # Drop the GeoDataFrames kept in memory by the read_* methods
+    with _shapefile_cache_lock:
+        _shapefile_cache.clear()
+
 class CensusShape:
-    def __init__(self, local_dir, year = None):
+    def __init__(self, local_dir, year = None, ftp_host = TIGER_FTP_HOST, ftp_port = 21):
         self.local_dir = local_dir
         self.year = year
+        self.ftp_host = ftp_host
+        self.ftp_port = ftp_port
     def __is_directory(self, ftp, item):
         # Check if the item is a directory
         if '.' in item:
@@ -35,62 +67,157 @@ class CensusShape:
     
     def __census_ftp_login(self, timeout=600):
         # Connect to the FTP server
-        ftp = FTP(TIGER_FTP_HOST, timeout=timeout)
+        ftp = FTP(timeout=timeout)
+        ftp.connect(self.ftp_host, self.ftp_port)
         ftp.login()
         return ftp
     
     def __census_ftp_root(self):
         return f'{TIGER_FTP_DIR_PREFIX}{self.year}/'
     
-    def __download_shapefiles(self, ftp, ftp_dir, local_dir, skip_existing=False, recursive=False):
-        # Change directory to the remote directory
-        if ftp_dir.startswith('/'):
-            ftp_dir = ftp_dir[1:]
-        elif ftp_dir.startswith('./'):
-            ftp_dir = ftp_dir[2:]
-    
-        ftp.cwd(ftp_dir)
-    
-        # Create the corresponding local directory if it doesn't exist
-        local_path = os.path.join(local_dir, ftp_dir)
-    
-        os.makedirs(local_path, exist_ok=True)
-    
-        # List files and directories in the remote directory
-        files = ftp.nlst()
-    
-        # Download files and recurse into directories
-        for file in files:
-            if self.__is_directory(ftp, file):  # if it's a directory
+    def __list_shapefiles(self, ftp, remote_dir, local_dir, recursive=False):
+        # Walk remote_dir and return (remote path, local path, size) of its files.
+        # Paths are absolute, so the walk does not depend on the current FTP directory.
+        ftp.cwd(remote_dir)
+        files = []
+        for item in ftp.nlst():
+            name = posixpath.basename(item.rstrip('/'))
+            if self.__is_directory(ftp, name):  # if it's a directory
                 if recursive:
-                    self.__download_shapefiles(ftp, file, local_path, True)
-    
+                    files.extend(self.__list_shapefiles(ftp, posixpath.join(remote_dir, name),
+                                                        os.path.join(local_dir, name), recursive))
             else:  # if it's a file
-                local_file = os.path.join(local_path, file)
-                # skip if the file already exists
-                if skip_existing and os.path.exists(local_file):
-                    print(f"Skipping {file} as it already exists in {local_file}")
-                    continue
-    
-                print(f"Downloading {file} to {local_file}")
-                with open(local_file, 'wb') as f:
-                    ftp.retrbinary('RETR ' + file, f.write)
-    
-    def download_shapefiles(self, datasets, skip_existing=False, recursive=False, timeout=600):
+                remote_path = posixpath.join(remote_dir, name)
+                files.append((remote_path, os.path.join(local_dir, name), self.__remote_size(ftp, remote_path)))
+        return files
+
+    def __remote_size(self, ftp, remote_path):
+        try:
+            ftp.voidcmd('TYPE I')
+            return ftp.size(remote_path)
+        except all_errors:
+            return None
+
+    def __ftp_connection(self, idle, timeout):
+        # An idle pooled connection or a new one
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            return self.__census_ftp_login(timeout=timeout)
+
+    def __download_shapefile(self, idle, remote_path, local_file, size, timeout, max_retries):
+        # Download one file into local_file.part on a pooled connection and rename it on completion.
+        # A dropped session is replaced by a new connection and the download resumes where it stopped.
+        os.makedirs(os.path.dirname(local_file), exist_ok=True)
+        part_file = local_file + '.part'
+        attempt = 0
+        while True:
+            ftp = None
+            try:
+                ftp = self.__ftp_connection(idle, timeout)
+                offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+                if size is not None and offset >= size:
+                    offset = 0
+                try:
+                    f = open(part_file, 'ab' if offset > 0 else 'wb')
+                except OSError as e:
+                    raise _LocalFileError(e)
+                with f:
+                    def write(data):
+                        try:
+                            f.write(data)
+                        except OSError as e:
+                            raise _LocalFileError(e)
+                    ftp.retrbinary('RETR ' + remote_path, write, rest=offset if offset > 0 else None)
+                idle.put(ftp)
+                break
+            except error_perm:
+                # Permanent errors (e.g. file not found) are not retried
+                if ftp is not None:
+                    idle.put(ftp)
+                raise
+            except _LocalFileError as e:
+                # Local failures (disk full, permissions) are not retried either.
+                # The transfer was interrupted, so the connection is not reused.
+                if ftp is not None:
+                    ftp.close()
+                raise e.error
+            except all_errors as e:
+                if ftp is not None:
+                    ftp.close()
+                if attempt >= max_retries:
+                    raise
+                print(f"Retrying {remote_path} after error: {e}")
+                time.sleep(min(60, 2 ** attempt))
+                attempt += 1
+
+        if size is not None and os.path.getsize(part_file) != size:
+            os.remove(part_file)
+            raise IOError(f"Size mismatch for {local_file}: expected {size:,} bytes, got a different size.")
+        os.replace(part_file, local_file)
+
+    def download_shapefiles(self, datasets, skip_existing=False, recursive=False, timeout=600,
+                            num_workers=1, max_retries=3):
+        """
+        Download shapefiles of datasets (folders such as 'TRACT' or 'BG') from the Census TIGER FTP site.
+
+        :param datasets: A dataset folder or a list of them. '' downloads the files in the year root folder.
+        :param skip_existing: Skips files that exist locally with the same size as on the server. Default is False.
+        :param recursive: Also downloads the sub folders of the datasets. Default is False.
+        :param timeout: FTP timeout in seconds. Default is 600.
+        :param num_workers: Number of files downloaded in parallel, each over its own FTP connection. Default is 1.
+        :param max_retries: Number of retries of a file after a dropped connection. Default is 3.
+        """
         # Connect to the FTP server
         ftp = self.__census_ftp_login(timeout=timeout)
 
         # Download files for each dataset
         if not isinstance(datasets, list):
             datasets = [datasets]
-    
+
+        # List the files of all datasets first
+        files = []
         for dataset in datasets:
-            # Change directory to the TIGER year root directory
-            ftp.cwd(self.__census_ftp_root())
-            self.__download_shapefiles(ftp, dataset, self.local_dir, skip_existing, recursive)
-    
-        # Quit the FTP connection
-        ftp.quit()
+            dataset = dataset.strip('/')
+            if dataset.startswith('./'):
+                dataset = dataset[2:]
+            remote_dir = self.__census_ftp_root() + dataset
+            files.extend(self.__list_shapefiles(ftp, remote_dir.rstrip('/'),
+                                                os.path.join(self.local_dir, dataset), recursive))
+
+        jobs = []
+        for remote_path, local_file, size in files:
+            # skip if the file already exists with the same size
+            if skip_existing and os.path.exists(local_file) and \
+                    (size is None or os.path.getsize(local_file) == size):
+                print(f"Skipping {remote_path} as it already exists in {local_file}")
+                continue
+            jobs.append((remote_path, local_file, size))
+
+        # Connections are reused by the following downloads
+        idle = queue.Queue()
+        idle.put(ftp)
+
+        def download(job):
+            remote_path, local_file, size = job
+            print(f"Downloading {remote_path} to {local_file}")
+            self.__download_shapefile(idle, remote_path, local_file, size, timeout, max_retries)
+
+        num_workers = max(1, int(num_workers))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(download, job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error downloading {futures[future][0]}: {e}")
+
+        # Quit the FTP connections
+        while not idle.empty():
+            try:
+                idle.get_nowait().quit()
+            except all_errors:
+                pass
 
     # Will be activated later ------------------
     # def geocode_addresses(df, address_column):
@@ -132,30 +259,109 @@ class CensusShape:
     # # df_geocoded = geocode_addresses(df_addresses, 'address')
     # # print(df_geocoded)
     #
-    def read_state_shapefile(self, dataset, state_code):
+    def __geoparquet_path(self, shapefile_path):
+        relative_path = os.path.relpath(shapefile_path, self.local_dir)
+        return os.path.join(self.local_dir, GEOPARQUET_DIR, os.path.splitext(relative_path)[0] + '.parquet')
+
+    def __to_geoparquet(self, shapefile_path):
+        # Convert a downloaded zip to GeoParquet once, and again when the zip is newer.
+        # Returns the GeoParquet path, or None if it cannot be written (pyarrow missing).
+        import geopandas as gpd
+
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            return None
+
+        parquet_path = self.__geoparquet_path(shapefile_path)
+        if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(shapefile_path):
+            return parquet_path
+
+        gdf = gpd.read_file("zip://" + shapefile_path)
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        part_path = parquet_path + '.part'
+        gdf.to_parquet(part_path, index=False)
+        os.replace(part_path, parquet_path)
+        return parquet_path
+
+    def __read_shapefile(self, shapefile_path, columns=None, use_cache=True):
+        # Read a downloaded zip through its GeoParquet file and keep it in memory
+        # with its spatial index built, so repeated reads return immediately.
+        import geopandas as gpd
+
+        if not use_cache:
+            return gpd.read_file("zip://" + shapefile_path, columns=columns)
+
+        key = (os.path.abspath(shapefile_path), os.path.getmtime(shapefile_path),
+               None if columns is None else tuple(columns))
+        with _shapefile_cache_lock:
+            if key in _shapefile_cache:
+                _shapefile_cache.move_to_end(key)
+                return _shapefile_cache[key]
+
+        parquet_path = self.__to_geoparquet(shapefile_path)
+        if parquet_path is None:
+            gdf = gpd.read_file("zip://" + shapefile_path, columns=columns)
+        else:
+            if columns is not None and 'geometry' not in columns:
+                columns = list(columns) + ['geometry']
+            gdf = gpd.read_parquet(parquet_path, columns=columns)
+        # Build the spatial index used by sjoin
+        gdf.sindex
+
+        with _shapefile_cache_lock:
+            _shapefile_cache[key] = gdf
+            while len(_shapefile_cache) > SHAPEFILE_CACHE_SIZE:
+                _shapefile_cache.popitem(last=False)
+        return gdf
+
+    def __shapefiles(self, dataset):
+        # Downloaded zip files of a dataset
+        local_dir = os.path.join(self.local_dir, dataset)
+        return sorted(file for file in os.listdir(local_dir) if file.endswith('.zip'))
+
+    def read_state_shapefile(self, dataset, state_code, columns=None, use_cache=True):
+        """
+        Read the shapefile of a state of a dataset (e.g. 'BG' or 'TRACT').
+
+        The zip file is converted to GeoParquet on the first read and the GeoDataFrame is kept
+        in memory with its spatial index, so later reads return a shallow copy of it right away.
+
+        :param dataset: Dataset folder such as 'TRACT'.
+        :param state_code: State FIPS code ('06') or abbreviation ('CA').
+        :param columns: Columns to read besides geometry. Default is None (all).
+        :param use_cache: Reads through the GeoParquet and in-memory caches. Default is True.
+        :return: A GeoDataFrame.
+        """
         # Read the shapefile
         if not state_code.isnumeric():
             state_code = us.states.lookup(state_code).fips
-    
+
         # _state_code_
         state_code_ = f'_{state_code}_'
-        local_dir = os.path.join(self.local_dir, dataset)
-    
-        files = os.listdir(local_dir)
+
         # Find the shapefile contains state_code_
-        file = [file for file in files if state_code_ in file]
-        shapefile_path = os.path.join(local_dir, file[0])
-    
-        gdf = gpd.read_file("zip://" + shapefile_path)
-    
-        return gdf
+        file = [file for file in self.__shapefiles(dataset) if state_code_ in file]
+        shapefile_path = os.path.join(self.local_dir, dataset, file[0])
+
+        # Changes to the returned GeoDataFrame do not reach the cached one
+        return self.__read_shapefile(shapefile_path, columns, use_cache).copy(deep=False)
 
-    def read_a_shapefile(self, dataset, state_code = None):
+    def read_a_shapefile(self, dataset, state_code = None, columns=None, use_cache=True):
+        """
+        Read the shapefile of a dataset with one file (e.g. 'CBSA'), or of a state with state_code.
+
+        :param dataset: Dataset folder such as 'CBSA'.
+        :param state_code: State FIPS code or abbreviation. Default is None.
+        :param columns: Columns to read besides geometry. Default is None (all).
+        :param use_cache: Reads through the GeoParquet and in-memory caches. Default is True.
+        :return: A GeoDataFrame.
+        """
         if state_code is not None:
-            return self.read_state_shapefile(dataset, state_code)
+            return self.read_state_shapefile(dataset, state_code, columns, use_cache)
         else:
             local_dir = os.path.join(self.local_dir, dataset)
-            files = os.listdir(local_dir)
+            files = self.__shapefiles(dataset)
             if len(files) == 0:
                 print(f"No files found in {local_dir}")
                 return None
@@ -163,6 +369,214 @@ class CensusShape:
                 print(f"Multiple files found in {local_dir}. Opening the first one.")
 
             shapefile_path = os.path.join(local_dir, files[0])
-            gdf = gpd.read_file("zip://" + shapefile_path)
+            return self.__read_shapefile(shapefile_path, columns, use_cache).copy(deep=False)
+
+    def __shapefile_bounds(self, shapefile_path):
+        # Bounding box of a shapefile, read from the GeoParquet metadata without loading it.
+        # None without pyarrow.
+        parquet_path = self.__to_geoparquet(shapefile_path)
+        if parquet_path is not None:
+            import pyarrow.parquet as pq
+            metadata = pq.read_schema(parquet_path).metadata or {}
+            if b'geo' in metadata:
+                geo = json.loads(metadata[b'geo'])
+                bbox = geo['columns'][geo['primary_column']].get('bbox')
+                if bbox is not None:
+                    return tuple(bbox)
+        return None
+
+    def __state_shapefiles(self, dataset, states=None):
+        # Paths of the downloaded zip files of a dataset.
+        # With states, only their files and national files ('_us_') are used.
+        files = self.__shapefiles(dataset)
+        if states is not None:
+            codes = [state if state.isnumeric() else us.states.lookup(state).fips for state in states]
+            files = [file for file in files
+                     if '_us_' in file or any(f'_{code}_' in file for code in codes)]
+        return [os.path.join(self.local_dir, dataset, file) for file in files]
+
+    def __tag_layers(self, dataset, states, columns):
+        # The shapefiles points are matched against: their path, bounds, and GeoDataFrame once
+        # loaded. The layers stay loaded for the whole tag_points call (or worker process),
+        # independent of the size of the shapefile cache.
+        layers = []
+        for path in self.__state_shapefiles(dataset, states):
+            layer = {'path': path, 'bounds': self.__shapefile_bounds(path), 'gdf': None}
+            if layer['bounds'] is None:
+                layer['gdf'] = self.__read_shapefile(path, columns)
+                layer['bounds'] = tuple(layer['gdf'].total_bounds)
+            layers.append(layer)
+        return layers
+
+    def __read_shapefile_bbox(self, shapefile_path, columns, bbox, use_cache):
+        # Read a shapefile, keeping only the polygons intersecting bbox
+        import geopandas as gpd
+        import numpy as np
+        from shapely.geometry import box
 
+        if not use_cache:
+            return gpd.read_file("zip://" + shapefile_path, columns=columns, bbox=bbox)
+        gdf = self.__read_shapefile(shapefile_path, columns)
+        if bbox is None:
             return gdf
+        return gdf.iloc[np.sort(gdf.sindex.query(box(*bbox), predicate='intersects'))]
+
+    def read_states_shapefile(self, dataset, state_codes=None, columns=None, bbox=None, num_workers=4,
+                              use_cache=True):
+        """
+        Read the shapefiles of several or all states of a dataset (e.g. 'BG' or 'TRACT') into one GeoDataFrame.
+
+        The files are read in parallel threads through the GeoParquet and in-memory caches.
+        With bbox, files whose bounds are outside it are not read, and only the polygons
+        intersecting it are kept. The states are combined with a single concatenation into
+        a new GeoDataFrame, which can be changed without affecting the cache.
+
+        Example:
+            us_tract_gdf = cs.read_states_shapefile('TRACT', columns=['GEOID'])
+            west_tract_gdf = cs.read_states_shapefile('TRACT', ['CA', 'OR', 'WA'], bbox=(-125, 32, -114, 49))
+
+        :param dataset: Dataset folder such as 'TRACT'.
+        :param state_codes: State FIPS codes or abbreviations. Default is None (all downloaded files).
+        :param columns: Columns to read besides geometry. Default is None (all).
+        :param bbox: (minx, miny, maxx, maxy) in longitude and latitude. Default is None (no filter).
+        :param num_workers: Number of files read at the same time. Default is 4.
+        :param use_cache: Reads through the GeoParquet and in-memory caches. Default is True.
+        :return: A GeoDataFrame.
+        """
+        import pandas as pd
+
+        paths = self.__state_shapefiles(dataset, state_codes)
+        if len(paths) == 0:
+            print(f"No files found in {os.path.join(self.local_dir, dataset)}")
+            return None
+        if bbox is not None and use_cache:
+            minx, miny, maxx, maxy = bbox
+            # Files without bounds (no pyarrow) are kept and cut by the spatial index
+            paths = [path for path in paths
+                     for bounds in [self.__shapefile_bounds(path)]
+                     if bounds is None or (bounds[0] <= maxx and bounds[2] >= minx
+                                           and bounds[1] <= maxy and bounds[3] >= miny)]
+            if len(paths) == 0:
+                print(f"No files of {dataset} intersect {bbox}")
+                return None
+
+        def read(path):
+            return self.__read_shapefile_bbox(path, columns, bbox, use_cache)
+
+        with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+            frames = list(executor.map(read, paths))
+
+        return pd.concat(frames, ignore_index=True)
+
+    def __tag_chunk(self, df, layers, latitude, longitude, columns, prefix):
+        # Assign each point the first polygon containing it. Points are prefiltered by the
+        # bounding box of each state file, and only the files with points in them are read.
+        import geopandas as gpd
+        import numpy as np
+        import pandas as pd
+
+        lat = pd.to_numeric(df[latitude], errors='coerce').to_numpy(dtype=float)
+        lon = pd.to_numeric(df[longitude], errors='coerce').to_numpy(dtype=float)
+        unassigned = np.isfinite(lat) & np.isfinite(lon)
+        values = {column: np.full(len(df), None, dtype=object) for column in columns}
+
+        for layer in layers:
+            minx, miny, maxx, maxy = layer['bounds']
+            mask = unassigned & (lon >= minx) & (lon <= maxx) & (lat >= miny) & (lat <= maxy)
+            if not mask.any():
+                continue
+            if layer['gdf'] is None:
+                layer['gdf'] = self.__read_shapefile(layer['path'], columns)
+            gdf = layer['gdf']
+            points = gpd.points_from_xy(lon[mask], lat[mask], crs=gdf.crs)
+            point_index, polygon_index = gdf.sindex.query(points, predicate='intersects')
+            if len(point_index) == 0:
+                continue
+            # A point on a shared boundary matches several polygons; keep the first
+            point_index, first = np.unique(point_index, return_index=True)
+            polygon_index = polygon_index[first]
+            positions = np.flatnonzero(mask)[point_index]
+            for column in columns:
+                values[column][positions] = gdf[column].to_numpy()[polygon_index]
+            unassigned[positions] = False
+
+        return df.assign(**{prefix + column: values[column] for column in columns})
+
+    def __tag_stream(self, chunks, dataset, latitude, longitude, columns, prefix, states, num_workers):
+        # Tag an iterable of chunks, keeping at most 2 * num_workers chunks in flight
+        if num_workers <= 1:
+            layers = self.__tag_layers(dataset, states, columns)
+            for chunk in chunks:
+                yield self.__tag_chunk(chunk, layers, latitude, longitude, columns, prefix)
+            return
+
+        # Convert the shapefiles before starting the processes, so they do not convert them concurrently
+        self.__tag_layers(dataset, states, columns)
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = deque()
+            for chunk in chunks:
+                futures.append(executor.submit(CensusShape._tag_points_worker, self.local_dir, self.year, chunk,
+                                               dataset, latitude, longitude, columns, prefix, states))
+                if len(futures) >= 2 * num_workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    def tag_points(self, data, dataset, latitude='latitude', longitude='longitude', columns=('GEOID',),
+                   prefix=None, states=None, num_workers=1, partition_size=1000000):
+        """
+        Assign census geographies (e.g. 'TRACT' or 'BG') to points in bulk.
+
+        Points are matched with a spatial index query on the shapefiles of the dataset.
+        Each state file is only read if some points fall in its bounding box, so a chunk
+        from one region does not load the whole country. With num_workers > 1, the points
+        are split into partitions of partition_size rows (or the chunks are used) and
+        tagged in separate processes.
+
+        Example:
+            cs = CensusShape(local_dir='C:/census_shape', year=2023)
+            tagged_df = cs.tag_points(df, 'TRACT', num_workers=8)
+
+            # Chunks from filter_data or DeweyDataset.iter_chunks
+            for chunk in cs.tag_points(dataset.iter_chunks(), 'BG', columns=['GEOID'], prefix='bg_'):
+                ...
+
+        :param data: A DataFrame object or an iterable of DataFrame objects.
+        :param dataset: Dataset folder such as 'TRACT'.
+        :param latitude: Latitude column. Default is 'latitude'.
+        :param longitude: Longitude column. Default is 'longitude'.
+        :param columns: Shapefile columns added to the points. Default is ('GEOID',).
+        :param prefix: Prefix of the added columns. Default is None (dataset and '_', e.g. 'TRACT_GEOID').
+        :param states: State FIPS codes or abbreviations to match against. Default is None (all downloaded files).
+        :param num_workers: Number of processes. Default is 1.
+        :param partition_size: Rows per partition of a DataFrame when num_workers > 1. Default is 1000000.
+        :return: A DataFrame object, or a generator of DataFrame objects for an iterable of chunks.
+                 Points outside every polygon get None.
+        """
+        import pandas as pd
+
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        if prefix is None:
+            prefix = f'{dataset}_'
+
+        if not isinstance(data, pd.DataFrame):
+            return self.__tag_stream(data, dataset, latitude, longitude, columns, prefix, states, num_workers)
+
+        if num_workers <= 1 or len(data) <= partition_size:
+            layers = self.__tag_layers(dataset, states, columns)
+            return self.__tag_chunk(data, layers, latitude, longitude, columns, prefix)
+
+        partitions = (data.iloc[start:start + partition_size] for start in range(0, len(data), partition_size))
+        return pd.concat(self.__tag_stream(partitions, dataset, latitude, longitude, columns, prefix,
+                                           states, num_workers))
+
+    @staticmethod
+    def _tag_points_worker(local_dir, year, chunk, dataset, latitude, longitude, columns, prefix, states):
+        # Runs in a worker process of tag_points. The process keeps the layers of the last
+        # call loaded, so the following chunks do not read the shapefiles again.
+        cs = CensusShape(local_dir, year)
+        key = (local_dir, year, dataset, None if states is None else tuple(states), tuple(columns))
+        if key not in _tag_worker_layers:
+            _tag_worker_layers.clear()
+            _tag_worker_layers[key] = cs.__tag_layers(dataset, states, columns)
+        return cs.__tag_chunk(chunk, _tag_worker_layers[key], latitude, longitude, columns, prefix)
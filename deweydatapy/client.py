@@ -0,0 +1,291 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+class TransferLimiter:
+    """
+    Limits file transfers with a bytes-per-second cap and a maximum number of
+    in-flight transfers, shared by all threads of a process. With lock_dir, the
+    in-flight limit is also shared by all processes using the same folder, e.g.
+    several download jobs on one host.
+    """
+    def __init__(self, max_bytes_per_second=None, max_transfers=None, lock_dir=None):
+        """
+        :param max_bytes_per_second: Maximum total download rate in bytes per second. Default is None (no limit).
+        :param max_transfers: Maximum number of files transferred at the same time. Default is None (no limit).
+        :param lock_dir: Folder of lock files sharing max_transfers across processes. Default is None (this process only).
+        """
+        if lock_dir is not None and max_transfers is None:
+            raise ValueError("lock_dir requires max_transfers.")
+        self.max_bytes_per_second = max_bytes_per_second
+        self.max_transfers = max_transfers
+        self.lock_dir = lock_dir
+        self.semaphore = threading.BoundedSemaphore(max_transfers) if max_transfers else None
+        if lock_dir is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+        # Token bucket allowing bursts of up to one second of transfer
+        self.tokens = max_bytes_per_second or 0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        """
+        Takes nbytes from the bandwidth budget.
+
+        :param nbytes: Number of bytes transferred.
+        :return: Seconds to wait before transferring more.
+        """
+        if not self.max_bytes_per_second:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.max_bytes_per_second,
+                              self.tokens + (now - self.last_refill) * self.max_bytes_per_second)
+            self.last_refill = now
+            self.tokens -= nbytes
+            return max(0, -self.tokens / self.max_bytes_per_second)
+
+    def throttle(self, nbytes):
+        """
+        Takes nbytes from the bandwidth budget, sleeping if it is used up.
+
+        :param nbytes: Number of bytes transferred.
+        """
+        delay = self.reserve(nbytes)
+        if delay > 0:
+            time.sleep(delay)
+
+    def try_acquire(self):
+        """
+        Takes a transfer slot without waiting.
+
+        :return: A slot to pass to release() or None if all slots are in use.
+        """
+        if self.semaphore is not None and not self.semaphore.acquire(blocking=False):
+            return None
+        if self.lock_dir is None:
+            return True
+        for i in range(self.max_transfers):
+            handle = open(os.path.join(self.lock_dir, f"transfer-{i}.lock"), 'a+')
+            try:
+                if os.name == 'nt':
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except OSError:
+                handle.close()
+        self.semaphore.release()
+        return None
+
+    def release(self, slot):
+        """
+        :param slot: A slot from try_acquire().
+        """
+        if slot is not True:
+            if os.name == 'nt':
+                slot.seek(0)
+                msvcrt.locking(slot.fileno(), msvcrt.LK_UNLCK, 1)
+            slot.close()
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+    @contextmanager
+    def transfer_slot(self):
+        """
+        Waits for a free transfer slot and holds it while in the with block.
+        """
+        if self.max_transfers is None:
+            yield
+            return
+        slot = self.try_acquire()
+        while slot is None:
+            time.sleep(0.05)
+            slot = self.try_acquire()
+        try:
+            yield
+        finally:
+            self.release(slot)
+
+    @asynccontextmanager
+    async def async_transfer_slot(self):
+        """
+        Same as transfer_slot() without blocking the event loop.
+        """
+        if self.max_transfers is None:
+            yield
+            return
+        slot = self.try_acquire()
+        while slot is None:
+            await asyncio.sleep(0.05)
+            slot = self.try_acquire()
+        try:
+            yield
+        finally:
+            self.release(slot)
+
+class DeweyClient:
+    """
+    HTTP client shared by the functions in deweydatapy.download.
+
+    Owns one keep-alive session with a connection pool, so connections and
+    TLS handshakes are reused across API calls and file downloads.
+    Connection errors, timeouts and retryable status codes (429 and 5xx) are
+    retried with exponential backoff and jitter, honoring Retry-After.
+
+    File downloads are limited by its TransferLimiter (bytes per second and
+    number of in-flight transfers).
+
+    Example:
+        ddp.set_client(ddp.DeweyClient(pool_size=32, max_retries=8,
+                                       max_bytes_per_second=50000000, max_transfers=8))
+    """
+    def __init__(self, pool_size=16, timeout=(10, 300), max_retries=5,
+                 backoff_factor=1.0, max_backoff=60,
+                 retry_statuses=(429, 500, 502, 503, 504),
+                 max_bytes_per_second=None, max_transfers=None, lock_dir=None):
+        """
+        :param pool_size: Number of pooled keep-alive connections. Default is 16.
+        :param timeout: Connect and read timeout in seconds, a number or a (connect, read) tuple. Default is (10, 300).
+        :param max_retries: Maximum number of retries of a request. Default is 5.
+        :param backoff_factor: Base delay in seconds of the exponential backoff. Default is 1.0.
+        :param max_backoff: Maximum delay in seconds between retries. Default is 60.
+        :param retry_statuses: HTTP status codes that are retried. Default is (429, 500, 502, 503, 504).
+        :param max_bytes_per_second: Maximum total download rate in bytes per second. Default is None (no limit).
+        :param max_transfers: Maximum number of files downloaded at the same time. Default is None (no limit).
+        :param lock_dir: Folder of lock files sharing max_transfers with other processes. Default is None (this process only).
+        """
+        self.limiter = TransferLimiter(max_bytes_per_second, max_transfers, lock_dir)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+        self.session = requests.Session()
+        self.pool_size = 0
+        self.lock = threading.Lock()
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size):
+        """
+        Grows the connection pool to at least pool_size connections.
+
+        :param pool_size: Number of connections, usually the number of concurrent workers.
+        """
+        with self.lock:
+            if self.pool_size < pool_size:
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                self.session.mount("https://", adapter)
+                self.session.mount("http://", adapter)
+                self.pool_size = pool_size
+
+    def get(self, url, params=None, headers=None, stream=False, on_retry=None):
+        """
+        Sends a GET request, retrying transient failures.
+
+        :param url: URL.
+        :param params: Query parameters.
+        :param headers: Request headers.
+        :param stream: Streams the response body. Default is False.
+        :param on_retry: Function called with the attempt number and the error before each retry. Default is None.
+        :return: A requests.Response object. The last response is returned when retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, params=params, headers=headers,
+                                            stream=stream, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                error = e
+            else:
+                if response.status_code not in self.retry_statuses or attempt >= self.max_retries:
+                    return response
+                delay = self.retry_after(response)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                error = f"HTTP {response.status_code}"
+                response.close()
+            if on_retry is not None:
+                on_retry(attempt, error)
+            time.sleep(delay)
+            attempt += 1
+
+    def backoff(self, attempt):
+        """
+        Exponential backoff with full jitter.
+
+        :param attempt: Number of the failed attempt, starting at 0.
+        :return: Delay in seconds.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def retry_after(self, response):
+        """
+        Delay requested by the server in the Retry-After header.
+
+        :param response: A requests.Response object.
+        :return: Delay in seconds or None.
+        """
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0), self.max_backoff)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+__default_client = None
+__default_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Returns the client used by the functions in deweydatapy.download.
+
+    :return: A DeweyClient object.
+    """
+    global __default_client
+    with __default_client_lock:
+        if __default_client is None:
+            __default_client = DeweyClient()
+        return __default_client
+
+def set_client(client):
+    """
+    Sets the client used by the functions in deweydatapy.download,
+    for example to change the connection pool size, timeouts or retries.
+
+    :param client: A DeweyClient object.
+    """
+    global __default_client
+    with __default_client_lock:
+        __default_client = client
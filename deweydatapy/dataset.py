@@ -0,0 +1,326 @@
+import os
+import re
+import sys
+
+import pandas as pd
+
+from .download import (DEFAULT_PARTITION, PARTITION_COLUMN, _apply_dtypes, _category_dtypes,
+                       _concat_frames, _filter_chunk, _import_pyarrow, _query_columns, infer_dtypes)
+
+def _csv_files(data_folder):
+    return sorted(file for file in os.listdir(data_folder)
+                  if file.endswith(".csv.gz") or file.endswith(".csv"))
+
+def _file_stem(file_name):
+    for extension in (".csv.gz", ".csv", ".parquet"):
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)]
+    return file_name
+
+def _partition_keys(files, files_df=None, filename_prefix=None):
+    # Maps local file names to their partition_key. Uses files_df when given,
+    # otherwise the last date in the file name (e.g. ...-DATE_RANGE_START-2023-09-04.csv.gz).
+    if filename_prefix is None:
+        filename_prefix = ""
+    listed = {}
+    if files_df is not None:
+        listed = dict(zip(filename_prefix + files_df['file_name'], files_df['partition_key']))
+
+    keys = {}
+    for file in files:
+        key = listed.get(file)
+        if key is None:
+            dates = re.findall(r'\d{4}-\d{2}-\d{2}', file)
+            key = dates[-1] if dates else None
+        keys[file] = key
+    return keys
+
+def _infer_schema(paths, schema_sample_files, column_types):
+    # Infers one schema from the first block of the first files, promoting types
+    # that differ between files (e.g. int64 and double to double).
+    pa = _import_pyarrow()
+    schemas = []
+    for path in paths[:max(1, schema_sample_files)]:
+        try:
+            reader = pa.csv.open_csv(pa.input_stream(path, compression='detect'))
+        except Exception as e:
+            # Reported again when the file is converted
+            print(f"Error reading {path}: {e}")
+            continue
+        schemas.append(reader.schema)
+        reader.close()
+    if not schemas:
+        raise IOError(f"None of the files could be read to infer the schema: {paths[:max(1, schema_sample_files)]}")
+    try:
+        schema = pa.unify_schemas(schemas, promote_options='permissive')
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        schema = schemas[0]
+
+    fields = []
+    for field in schema:
+        if pa.types.is_integer(field.type):
+            field = field.with_type(pa.int64())
+        elif pa.types.is_null(field.type):
+            # All empty in the sample
+            field = field.with_type(pa.string())
+        if column_types is not None and field.name in column_types:
+            field = field.with_type(column_types[field.name])
+        fields.append(field)
+    return pa.schema(fields)
+
+def _widen_schema(schema, column_types, as_string):
+    # Integer columns as float64, or all columns as strings, except those set in column_types
+    pa = _import_pyarrow()
+    fields = []
+    for field in schema:
+        if column_types is None or field.name not in column_types:
+            if as_string:
+                field = field.with_type(pa.string())
+            elif pa.types.is_integer(field.type):
+                field = field.with_type(pa.float64())
+        fields.append(field)
+    return pa.schema(fields)
+
+def _write_parquet(path, dest_path, schema, compression):
+    # Converts one csv file in blocks through a .part file
+    pa = _import_pyarrow()
+    part_path = dest_path + ".part"
+    try:
+        reader = pa.csv.open_csv(pa.input_stream(path, compression='detect'),
+                                 convert_options=pa.csv.ConvertOptions(column_types=schema))
+        with pa.parquet.ParquetWriter(part_path, reader.schema, compression=compression) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+        os.replace(part_path, dest_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+def convert_to_parquet(data_folder, output_folder, files_df=None, filename_prefix=None,
+                       column_types=None, compression='zstd', schema_sample_files=5,
+                       overwrite=False):
+    """
+    Converts downloaded csv.gz (or csv) files into a Parquet dataset partitioned by partition_key.
+
+    Each file becomes output_folder/partition_key=<date>/<file name>.parquet, read and written in
+    blocks so that large files are not held in memory. All files share one schema inferred from the
+    first files, so the dataset can be read with column pruning and partition filtering
+    (for example with DeweyDataset or pyarrow.dataset). Already converted files are skipped.
+
+    Requires pyarrow.
+
+    :param data_folder: Folder where user has the downloaded files.
+    :param output_folder: Folder to write the Parquet dataset.
+    :param files_df: File list from get_file_list used to download the files. Default is None, which takes the partition_key from the date in the file names.
+    :param filename_prefix: Prefix used for file names when downloading. Default is None.
+    :param column_types: Dictionary of column name to pyarrow type overriding inferred types. Default is None.
+    :param compression: Parquet compression codec. Default is 'zstd'.
+    :param schema_sample_files: Number of files sampled to infer the schema. Default is 5.
+    :param overwrite: Converts files again even if their Parquet file exists. Default is False.
+    :return: The pyarrow schema of the dataset. Files whose values do not fit it are written with wider types.
+        Raises IOError listing the files that could not be converted after the others are converted.
+    """
+    _import_pyarrow()
+
+    files = _csv_files(data_folder)
+    if not files:
+        print(f"No CSV files found in {data_folder}")
+        return None
+
+    paths = [os.path.join(data_folder, file) for file in files]
+    schema = _infer_schema(paths, schema_sample_files, column_types)
+    widenings = ['the inferred types', 'integers as float64', 'inferred columns as strings']
+    schemas = [schema, _widen_schema(schema, column_types, False), _widen_schema(schema, column_types, True)]
+    failed = []
+
+    partition_keys = _partition_keys(files, files_df, filename_prefix)
+    partitioned = any(key is not None for key in partition_keys.values())
+
+    for i, file in enumerate(files):
+        print(f"Converting File {i+1}/{len(files)}")
+        key = partition_keys[file]
+        if partitioned:
+            dest_dir = os.path.join(output_folder, f"{PARTITION_COLUMN}={key if key is not None else DEFAULT_PARTITION}")
+        else:
+            dest_dir = output_folder
+        os.makedirs(dest_dir, exist_ok=True)
+        dest_path = os.path.join(dest_dir, _file_stem(file) + ".parquet")
+
+        if os.path.exists(dest_path) and not overwrite:
+            print(f"File already converted: {dest_path}")
+            continue
+
+        # Values outside the inferred types (e.g. 1.5 in an int64 column further down the file)
+        # fail the conversion, which is retried with integers widened to float64, then with
+        # the inferred columns read as strings.
+        error = None
+        for attempt, file_schema in enumerate(schemas):
+            if attempt > 0:
+                print(f"Retrying {paths[i]} with {widenings[attempt]} after error: {error}")
+            try:
+                _write_parquet(paths[i], dest_path, file_schema, compression)
+                error = None
+                break
+            except Exception as e:
+                error = e
+        if error is not None:
+            print(f"Error converting {paths[i]}: {error}")
+            failed.append(paths[i])
+        sys.stdout.flush()
+
+    if failed:
+        raise IOError(f"{len(failed)} of {len(files)} files could not be converted: {failed}")
+    print("Done!")
+    return schema
+
+class DeweyDataset:
+    """
+    Lazy, partition-aware reader over a download folder or a Parquet dataset.
+
+    Files are mapped to their partition_key (from files_df, the partition_key=...
+    directories of convert_to_parquet, or the date in the file name), so a date
+    range selects files before any of them is opened. Only the requested columns
+    are read, and data is returned chunk by chunk or as one DataFrame on demand.
+
+    Example:
+        dataset = ddp.DeweyDataset("C:/Temp", files_df)
+        for chunk in dataset.iter_chunks(columns=["PLACEKEY", "RAW_VISIT_COUNTS"],
+                                         start_date="2023-10-01", end_date="2023-10-31"):
+            ...
+    """
+    def __init__(self, data_folder, files_df=None, filename_prefix=None):
+        """
+        :param data_folder: Folder with downloaded csv.gz/csv files or, if it has none, a Parquet dataset from convert_to_parquet.
+        :param files_df: File list from get_file_list used to download the files. Default is None.
+        :param filename_prefix: Prefix used for file names when downloading. Default is None.
+        """
+        self.data_folder = data_folder
+        rows = []
+        csv_files = _csv_files(data_folder)
+        if csv_files:
+            keys = _partition_keys(csv_files, files_df, filename_prefix)
+            for file in csv_files:
+                rows.append({'file_name': file, 'path': os.path.join(data_folder, file),
+                             'partition_key': keys[file], 'format': 'csv'})
+        else:
+            for root, dirs, files in os.walk(data_folder):
+                dirs.sort()
+                key = None
+                directory = os.path.basename(root)
+                if directory.startswith(PARTITION_COLUMN + "=") and directory != f"{PARTITION_COLUMN}={DEFAULT_PARTITION}":
+                    key = directory[len(PARTITION_COLUMN) + 1:]
+                for file in sorted(files):
+                    if file.endswith(".parquet"):
+                        rows.append({'file_name': file, 'path': os.path.join(root, file),
+                                     'partition_key': key, 'format': 'parquet'})
+        self.files = pd.DataFrame(rows, columns=['file_name', 'path', 'partition_key', 'format'])
+
+    def select_files(self, start_date=None, end_date=None):
+        """
+        Files with partition_key within the date range. Files without partition_key are always selected.
+
+        :param start_date: Start date character in the form of "2023-08-21". Default is None (no limit).
+        :param end_date: End date character in the form of "2023-08-21". Default is None (no limit).
+        :return: A DataFrame object contains files information.
+        """
+        keep = pd.Series(True, index=self.files.index)
+        key = self.files['partition_key']
+        if start_date is not None:
+            keep &= key.isna() | (key >= start_date)
+        if end_date is not None:
+            keep &= key.isna() | (key <= end_date)
+        return self.files[keep]
+
+    def iter_chunks(self, columns=None, start_date=None, end_date=None, query=None,
+                    chunksize=100000, dtype=None):
+        """
+        Reads the selected files lazily.
+
+        :param columns: Subset of columns to read. Default is None, which indicates all columns.
+        :param start_date: Start date of partition_key in the form of "2023-08-21". Default is None (no limit).
+        :param end_date: End date of partition_key in the form of "2023-08-21". Default is None (no limit).
+        :param query: String containing query the columns of a pandas DataFrame with a boolean expression. Default is None, which indicates all rows.
+        :param chunksize: Number of rows per chunk. Default is 100000.
+        :param dtype: Column types from infer_dtypes, or 'infer' to infer them from the first selected files. Default is None.
+        :return: An iterator of DataFrame objects.
+        """
+        selected = self.select_files(start_date, end_date)
+        if isinstance(dtype, str) and dtype == 'infer':
+            dtype = self.infer_dtypes(selected)
+        for row in selected.itertuples():
+            if row.format == 'parquet':
+                chunks = self.__iter_parquet(row.path, columns, query, chunksize)
+            else:
+                chunks = self.__iter_csv(row.path, columns, query, chunksize, dtype)
+            for chunk in chunks:
+                if row.format == 'parquet' and dtype is not None:
+                    # The csv parser builds categories for csv files
+                    chunk = chunk.astype({column: kind for column, kind in _category_dtypes(dtype).items()
+                                          if column in chunk.columns})
+                yield _filter_chunk(_apply_dtypes(chunk, dtype), query, columns)
+
+    def read(self, columns=None, start_date=None, end_date=None, query=None, dtype=None):
+        """
+        Reads the selected files into one DataFrame. Category columns stay categories
+        across files.
+
+        :param columns: Subset of columns to read. Default is None, which indicates all columns.
+        :param start_date: Start date of partition_key in the form of "2023-08-21". Default is None (no limit).
+        :param end_date: End date of partition_key in the form of "2023-08-21". Default is None (no limit).
+        :param query: String containing query the columns of a pandas DataFrame with a boolean expression. Default is None, which indicates all rows.
+        :param dtype: Column types from infer_dtypes, or 'infer' to infer them from the first selected files. Default is None.
+        :return: A DataFrame object contains data.
+        """
+        chunks = list(self.iter_chunks(columns, start_date, end_date, query, chunksize=1000000, dtype=dtype))
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        return _concat_frames(chunks)
+
+    def infer_dtypes(self, files=None, sample_files=3, nrows=10000):
+        """
+        Compact column types inferred from a sample of the files. See deweydatapy.infer_dtypes.
+
+        :param files: Files to sample, from select_files. Default is None (all files).
+        :param sample_files: Number of files sampled. Default is 3.
+        :param nrows: Number of rows sampled from each file. Default is 10000.
+        :return: A dictionary of column name to type.
+        """
+        if files is None:
+            files = self.files
+        samples = []
+        for row in files.head(sample_files).itertuples():
+            if row.format == 'parquet':
+                pa = _import_pyarrow()
+                batches = pa.parquet.ParquetFile(row.path).iter_batches(batch_size=nrows)
+                batch = next(batches, None)
+                if batch is not None:
+                    samples.append(batch.to_pandas())
+            else:
+                samples.append(row.path)
+        return infer_dtypes(samples, nrows=nrows)
+
+    def __needed_columns(self, header, columns, query):
+        if columns is None:
+            return None
+        needed = set(columns) | set(_query_columns(query, header))
+        return [column for column in header if column in needed]
+
+    def __iter_csv(self, path, columns, query, chunksize, dtype=None):
+        header = pd.read_csv(path, nrows=0).columns
+        usecols = self.__needed_columns(header, columns, query)
+        with pd.read_csv(path, usecols=usecols, dtype=_category_dtypes(dtype), chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+
+    def __iter_parquet(self, path, columns, query, chunksize):
+        pa = _import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(path)
+        usecols = self.__needed_columns(parquet_file.schema_arrow.names, columns, query)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=usecols):
+            yield batch.to_pandas()
+
+    def __len__(self):
+        return self.files.shape[0]
+
+    def __repr__(self):
+        return f"DeweyDataset('{self.data_folder}', {len(self)} files)"
@@ -1,16 +1,65 @@
 import gzip
+import io
+import json
 import os
+import queue
+import re
+import shutil
 import sys
-from io import BytesIO
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from io import BufferedReader
 
 import pandas as pd
 import requests
 from datetime import datetime
-
-def __make_api_endpoint(path):
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from .cache import get_cache
+from .client import get_client
+from .metrics import DownloadMetrics
+
+# Size of the chunks written to disk while streaming a download
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Read buffer used while streaming a sample
+SAMPLE_READ_BUFFER_SIZE = 64 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+# Columns of files_df and pages_meta from get_file_list_full
+FILE_LIST_COLUMNS = ['link', 'partition_key', 'file_name', 'file_extension',
+                     'file_size_bytes', 'modified_at']
+PAGES_META_COLUMNS = ['page', 'number_of_files_for_page', 'avg_file_size_for_page_MB',
+                      'partition_column']
+# Download manifest kept in each destination folder
+MANIFEST_FILE_NAME = ".dewey_manifest.jsonl"
+# Incremental sync state kept in each destination folder
+SYNC_STATE_FILE_NAME = ".dewey_sync.json"
+# Errors of a dropped or stalled connection during a transfer, retried by __download_job.
+# Transformed files read response.raw directly, which raises the urllib3 errors, and a
+# truncated gzip stream raises EOFError.
+RETRYABLE_TRANSFER_ERRORS = (requests.ConnectionError, requests.Timeout,
+                             requests.exceptions.ChunkedEncodingError,
+                             ProtocolError, ReadTimeoutError, EOFError)
+# Name of the hive partition directories of Parquet output (partition_key=2023-09-04)
+PARTITION_COLUMN = "partition_key"
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+# Output formats of download_files with query/columns
+OUTPUT_FORMATS = ('csv', 'csv.gz', 'parquet')
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("This function requires pyarrow. Install it with: pip install pyarrow")
+    return pyarrow
+
+def _make_api_endpoint(path):
     # remove trailing spaces
     path = path.strip()
-    if not path.startswith("https://"):
+    if not path.startswith(("https://", "http://")):
         api_endpoint = f"https://app.deweydata.io/external-api/v3/products/{path}/files"
         return api_endpoint
     else:
@@ -25,11 +74,19 @@ def get_meta(apikey, product_path, print_meta=True):
     :param print_meta: Print meta information. Default is True.
     :return: A DataFrame object contains meta information.
     """
-    product_path = __make_api_endpoint(product_path)
+    product_path = _make_api_endpoint(product_path)
+
+    cache = get_cache()
+    if cache is not None:
+        cache_key = cache.key(product_path + "/metadata", None, apikey)
+        res_json = cache.get(cache_key)
+        if res_json is not None:
+            return _make_meta(res_json, print_meta)
+
     try:
-        response = requests.get(url=product_path+"/metadata",
-                                headers={'X-API-KEY': apikey,
-                                         'accept': 'application/json'})
+        response = get_client().get(url=product_path+"/metadata",
+                                    headers={'X-API-KEY': apikey,
+                                             'accept': 'application/json'})
     except Exception as e:
         print("Error in requests.get")
         print(e)
@@ -50,6 +107,12 @@ def get_meta(apikey, product_path, print_meta=True):
         print(" ")
         return None
 
+    if cache is not None:
+        cache.set(cache_key, res_json)
+
+    return _make_meta(res_json, print_meta)
+
+def _make_meta(res_json, print_meta):
     meta = res_json
     # total_size is in mega bytes
     meta['total_size'] = meta['total_size'] / 1000000
@@ -94,10 +157,121 @@ def print_selection_meta(selection_meta, pages_meta):
     print("-----------------------------------------------------------------")
     sys.stdout.flush()
 
+def __fetch_file_page(client, apikey, product_path, page, params, metrics=None):
+    # Fetch one page of the file list. Transient failures are retried by the client.
+    # Returns the response json or None on error.
+    started = time.perf_counter()
+    res_json = __request_file_page(client, apikey, product_path, page, params)
+    if metrics is not None and res_json is not None:
+        metrics.record_page(page, time.perf_counter() - started)
+    return res_json
+
+def __request_file_page(client, apikey, product_path, page, params):
+    params = dict(params, page=page)
+
+    cache = get_cache()
+    if cache is not None:
+        cache_key = cache.key(product_path, params, apikey)
+        res_json = cache.get(cache_key)
+        if res_json is not None:
+            return res_json
+
+    try:
+        response = client.get(url=product_path,
+                              params=params,
+                              headers={'X-API-KEY': apikey,
+                                       'accept': 'application/json'})
+    except Exception as e:
+        print("Error in requests.get")
+        print(e)
+        print(" ")
+        return None
+
+    if response is None:
+        return None
+    elif response.status_code == 401:
+        print(response)
+        return None
+    elif response.status_code == 422:
+        print(response)
+        return None
+
+    res_json = response.json()
+    if 'page' not in res_json:
+        print("Error in response.json")
+        print(res_json)
+        print(" ")
+        return None
+
+    if cache is not None:
+        cache.set(cache_key, res_json)
+
+    return res_json
+
+def _file_list_params(meta, start_date=None, end_date=None):
+    # Query parameters selecting the date range of the file list
+    if start_date is None:
+        start_date = "1000-01-01"
+    if end_date is None:
+        end_date = "9999-12-31"
+
+    # To proper date format: for example '2023-3-4' to '2023-03-04'
+    start_date = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+    end_date = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+    if(meta['partition_column'] is None):
+        return {}
+    else:
+        return {'partition_key_after': start_date,
+                'partition_key_before': end_date}
+
+def _selection_meta(res_json):
+    return pd.DataFrame({
+        'total_files': [res_json['total_files']],
+        'total_pages': [res_json['total_pages']],
+        'total_size_MB': [res_json['total_size'] / 1000000],
+        'expires_at': [res_json['expires_at']]
+    })
+
+def _assemble_file_list(page_jsons):
+    # Build files_df and pages_meta from the page responses ({page: json}).
+    # Rows are collected in plain lists and materialized once, so the cost per
+    # page stays flat instead of re-copying the accumulated frame every page.
+    page_rows = []
+    file_rows = []
+    for page in sorted(page_jsons):
+        res_json = page_jsons[page]
+        page_rows.append({
+            'page': res_json['page'],
+            'number_of_files_for_page': res_json['number_of_files_for_page'],
+            'avg_file_size_for_page_MB': res_json['avg_file_size_for_page'] / 1000000,
+            'partition_column': res_json['partition_column']
+        })
+        for link in res_json['download_links']:
+            row = {'page': res_json['page']}
+            row.update(link)
+            file_rows.append(row)
+
+    pages_meta = pd.DataFrame(page_rows, columns=PAGES_META_COLUMNS)
+    if file_rows:
+        files_df = pd.DataFrame(file_rows)
+    else:
+        files_df = pd.DataFrame(columns=['page'] + FILE_LIST_COLUMNS)
+
+    # Stable dtypes regardless of page contents
+    files_df['page'] = files_df['page'].astype('int64')
+    if 'file_size_bytes' in files_df.columns and files_df['file_size_bytes'].notna().all():
+        files_df['file_size_bytes'] = files_df['file_size_bytes'].astype('int64')
+    pages_meta['page'] = pages_meta['page'].astype('int64')
+
+    return files_df, pages_meta
+
 def get_file_list_full(apikey, product_path, start_page=1, end_page=float('inf'),
                   start_date=None, end_date=None,
                   meta=None,
-                  print_info=True):
+                  print_info=True,
+                  num_workers=4,
+                  metrics=None):
     """
     Collects the file list information from data server.
 
@@ -108,97 +282,61 @@ def get_file_list_full(apikey, product_path, start_page=1, end_page=float('inf')
     :param start_date: Data start date character for files in the form of '2021-07-01'. Default is None ("1000-01-01"), which indicates no limit.
     :param end_date: Data end date character for files in the form of '2023-08-21'. Default is None ('9999-12-31'), which indicates no limit.
     :param print_info: Print file list information. Default is True.
+    :param num_workers: Maximum number of pages requested concurrently once the first page
+        reveals the total number of pages. Default is 4.
+    :param metrics: DownloadMetrics object recording the listing time. Default is None.
     :return: DataFrame object contains files information, selection meta and pages meta.
     """
 
-    product_path = __make_api_endpoint(product_path)
+    started = time.perf_counter()
+    product_path = _make_api_endpoint(product_path)
     if(meta is None):
         meta = get_meta(apikey, product_path, print_meta=False)
 
-    selection_meta = None
-    pages_meta = None
-    files_df = None
+    params_ = _file_list_params(meta, start_date, end_date)
 
-    if start_date is None:
-        start_date = "1000-01-01"
-    if end_date is None:
-        end_date = "9999-12-31"
+    num_workers = max(1, int(num_workers))
+    client = get_client()
+    client.ensure_pool_size(num_workers)
 
-    # To proper date format: for example '2023-3-4' to '2023-03-04'
-    start_date = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y-%m-%d')
-    end_date = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+    # The first page tells the total number of pages
+    res_json = __fetch_file_page(client, apikey, product_path, start_page, params_, metrics)
+    if res_json is None:
+        return None
 
-    page = start_page
-    while True:
-        if(meta['partition_column'] is None):
-            params_ = {'page': page}
-        else:
-            params_ = {'page': page,
-                       'partition_key_after': start_date,
-                       'partition_key_before': end_date}
-        try:
-            response = requests.get(url=product_path,
-                                    params=params_,
-                                    headers={'X-API-KEY': apikey,
-                                             'accept': 'application/json'})
-        except Exception as e:
-            print("Error in requests.get")
-            print(e)
-            print(" ")
-            return None
-
-        if response is None:
-            return None
-        elif response.status_code == 401:
-            print(response)
-            return None
-        elif response.status_code == 422:
-            print(response)
-            return None
-
-        res_json = response.json()
-        if 'page' not in res_json:
-            print("Error in response.json")
-            print(res_json)
-            print(" ")
-            return None
-
-        # Initialize
-        if res_json['page'] == start_page:
-            selection_meta = pd.DataFrame({
-                'total_files': [res_json['total_files']],
-                'total_pages': [res_json['total_pages']],
-                'total_size_MB': [res_json['total_size'] / 1000000],
-                'expires_at': [res_json['expires_at']]
-            })
-
-        if(print_info == True):
-            print(f"Collecting files information for page {res_json['page']}/{res_json['total_pages']}...")
-
-        pages_meta = pd.concat([
-            pages_meta,
-            pd.DataFrame({
-                'page': [res_json['page']],
-                'number_of_files_for_page': [res_json['number_of_files_for_page']],
-                'avg_file_size_for_page_MB': [res_json['avg_file_size_for_page'] / 1000000],
-                'partition_column': [res_json['partition_column']]
-            })], ignore_index=True)
-
-        page_files_df = pd.DataFrame(res_json['download_links'])
-
-        page_files_df.insert(loc=0, column='page', value=res_json['page'])
-
-        files_df = pd.concat([files_df, page_files_df], ignore_index=True)
-
-        page = res_json['page'] + 1
+    selection_meta = _selection_meta(res_json)
 
+    if(print_info == True):
+        print(f"Collecting files information for page {res_json['page']}/{res_json['total_pages']}...")
         sys.stdout.flush()
 
-        if page > res_json['total_pages'] or page > end_page:
-            if(print_info == True):
-                print("Files information collection completed.")
-                sys.stdout.flush()
-            break
+    page_jsons = {res_json['page']: res_json}
+    last_page = min(res_json['total_pages'], end_page)
+
+    # Then the remaining pages are requested concurrently
+    rest_pages = range(res_json['page'] + 1, int(last_page) + 1)
+    if len(rest_pages) > 0:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(__fetch_file_page, client, apikey, product_path, page, params_, metrics): page
+                       for page in rest_pages}
+            for future in as_completed(futures):
+                page_json = future.result()
+                if page_json is None:
+                    for f in futures:
+                        f.cancel()
+                    return None
+                page_jsons[futures[future]] = page_json
+                if(print_info == True):
+                    print(f"Collecting files information for page {page_json['page']}/{page_json['total_pages']}...")
+                    sys.stdout.flush()
+
+    if(print_info == True):
+        print("Files information collection completed.")
+        sys.stdout.flush()
+
+    files_df, pages_meta = _assemble_file_list(page_jsons)
+    if metrics is not None:
+        metrics.record_listing(time.perf_counter() - started, len(page_jsons))
 
     # Backward compatibility
     files_df['download_link'] = files_df['link']
@@ -223,7 +361,9 @@ def get_file_list_full(apikey, product_path, start_page=1, end_page=float('inf')
 def get_file_list(apikey, product_path, start_page=1, end_page=float('inf'),
                   start_date=None, end_date=None,
                   meta=None,
-                  print_info=True):
+                  print_info=True,
+                  num_workers=4,
+                  metrics=None):
     """
     Collects the file list information from data server.
 
@@ -234,6 +374,8 @@ def get_file_list(apikey, product_path, start_page=1, end_page=float('inf'),
     :param start_date: Data start date character for files in the form of '2021-07-01'. Default is None ("1000-01-01"), which indicates no limit.
     :param end_date: Data end date character for files in the form of '2023-08-21'. Default is None ('9999-12-31'), which indicates no limit.
     :param print_info: Print file list information. Default is True.
+    :param num_workers: Maximum number of pages requested concurrently. Default is 4.
+    :param metrics: DownloadMetrics object recording the listing time. Default is None.
     :return: A DataFrame object contains files information.
     """
 
@@ -241,7 +383,9 @@ def get_file_list(apikey, product_path, start_page=1, end_page=float('inf'),
                                                         start_page, end_page,
                                                         start_date, end_date,
                                                         meta,
-                                                        print_info)
+                                                        print_info,
+                                                        num_workers,
+                                                        metrics)
 
     return files_df
 
@@ -259,15 +403,21 @@ def read_sample(url, nrows=100):
     #   nrows = 1000;
     # }
 
-    # Create a response object from the URL
-    response = requests.get(url)
-
-    try:
-        df = pd.read_csv(BytesIO(response.content), compression="gzip", nrows=nrows)
-    except gzip.BadGzipFile:  # not gzip file. try normal csv
-        df = pd.read_csv(BytesIO(response.content), nrows=nrows)
-    except:
-        print("Could not read the data. Can only open gzip csv file or csv file.")
+    # Stream the response and stop reading as soon as nrows rows are parsed,
+    # so only the beginning of a large file is transferred.
+    df = None
+    with get_client().get(url, stream=True) as response:
+        response.raw.decode_content = True
+        # Keep the raw stream open at the end of the body for the buffered reader
+        response.raw.auto_close = False
+        stream = BufferedReader(response.raw, buffer_size=SAMPLE_READ_BUFFER_SIZE)
+        try:
+            if stream.peek(2)[:2] == GZIP_MAGIC:
+                df = pd.read_csv(gzip.GzipFile(fileobj=stream), nrows=nrows)
+            else:  # not gzip file. try normal csv
+                df = pd.read_csv(stream, nrows=nrows)
+        except:
+            print("Could not read the data. Can only open gzip csv file or csv file.")
 
     return (df)
 
@@ -294,53 +444,475 @@ def read_sample0(apikey, product_path, nrows=100):
 # Backward compatibility
 read_sample_data0 = read_sample0
 
+class _DownloadProgress:
+    """
+    Aggregates per-file progress of (possibly concurrent) downloads into
+    one overall throughput/ETA report.
+    """
+    def __init__(self, num_files, total_bytes=None):
+        self.num_files = num_files
+        self.total_bytes = total_bytes
+        self.done_files = 0
+        self.done_bytes = 0
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+
+    def update(self, nbytes, skipped=False):
+        with self.lock:
+            self.done_files += 1
+            if not skipped:
+                self.done_bytes += nbytes
+            elif self.total_bytes is not None:
+                # Skipped files do not count towards the transfer rate
+                self.total_bytes -= nbytes
+            return self.report()
+
+    def report(self):
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        rate = self.done_bytes / elapsed
+        if self.total_bytes and rate > 0:
+            eta = max(self.total_bytes - self.done_bytes, 0) / rate
+        elif self.done_files > 0:
+            eta = elapsed / self.done_files * (self.num_files - self.done_files)
+        else:
+            eta = float('nan')
+        return "Completed {}/{} files | {:,} MB | {:,} MB/s | ETA {}".format(
+            self.done_files, self.num_files,
+            round(self.done_bytes / 1000000, 2), round(rate / 1000000, 2),
+            self.format_seconds(eta))
+
+    @staticmethod
+    def format_seconds(seconds):
+        if seconds != seconds:  # nan
+            return "--:--:--"
+        seconds = int(seconds)
+        return "{:02d}:{:02d}:{:02d}".format(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
+
+class _DownloadManifest:
+    """
+    Persistent record of the downloads made into a destination folder.
+
+    Each update is appended as one JSON line to MANIFEST_FILE_NAME, so recording
+    thousands of files stays cheap; the latest line for a file wins when loaded.
+    Entries hold link, partition_key, expected_size, bytes_written, status
+    ("downloading", "completed" or "failed") and updated_at.
+    """
+    def __init__(self, dest_folder):
+        self.path = os.path.join(dest_folder, MANIFEST_FILE_NAME)
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+                self.entries.setdefault(entry['file_name'], {}).update(entry)
+        # Compact to one line per file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def get(self, file_name):
+        with self.lock:
+            return dict(self.entries.get(file_name, {}))
+
+    def update(self, file_name, **fields):
+        with self.lock:
+            entry = self.entries.setdefault(file_name, {'file_name': file_name})
+            entry.update(fields)
+            entry['updated_at'] = datetime.now().isoformat(timespec='seconds')
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+
+def __download_file(client, link, dest_path, expected_size=None, resume=True,
+                    chunk_size=DOWNLOAD_CHUNK_SIZE, on_retry=None, stats=None):
+    # Stream the body in fixed-size chunks into a temporary file so that memory
+    # use stays flat regardless of the file size, then atomically move it in place.
+    # A crashed download never leaves a truncated file at dest_path, and its
+    # .part file is resumed with an HTTP Range request on the next run.
+    # Returns the number of bytes transferred and the final file size.
+    # stats, if given, receives the latency (seconds until the response headers).
+    part_path = dest_path + ".part"
+
+    offset = 0
+    if resume and os.path.exists(part_path):
+        offset = os.path.getsize(part_path)
+        if expected_size is not None and offset > expected_size:
+            offset = 0
+
+    nbytes = 0
+    if expected_size is None or offset < expected_size:
+        headers = {'Range': f'bytes={offset}-'} if offset > 0 else None
+        # Wait for a transfer slot and stay under the bandwidth cap of the client
+        limiter = client.limiter
+        with limiter.transfer_slot():
+            requested = time.perf_counter()
+            with client.get(link, headers=headers, stream=True, on_retry=on_retry) as response:
+                if stats is not None:
+                    stats['latency'] = time.perf_counter() - requested
+                range_failed = response.status_code == 416
+                if not range_failed:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        # Server ignored the Range header and sent the whole file
+                        offset = 0
+                    with open(part_path, 'ab' if offset > 0 else 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            if chunk:
+                                f.write(chunk)
+                                nbytes += len(chunk)
+                                limiter.throttle(len(chunk))
+        if range_failed:
+            # Range not satisfiable. Start over.
+            os.remove(part_path)
+            return __download_file(client, link, dest_path, expected_size, False, chunk_size,
+                                   on_retry, stats)
+
+    size = offset + nbytes
+    if expected_size is not None and size != expected_size:
+        os.remove(part_path)
+        raise IOError(f"Size mismatch for {dest_path}: expected {expected_size:,} bytes, got {size:,} bytes.")
+
+    os.replace(part_path, dest_path)
+    return nbytes, size
+
+class _ThrottledStream(io.RawIOBase):
+    """
+    Response body of a streamed download, counting the bytes received and
+    keeping them under the bandwidth cap of the client.
+    """
+    def __init__(self, raw, limiter):
+        self.raw = raw
+        self.limiter = limiter
+        self.nbytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        if n:
+            self.nbytes += n
+            self.limiter.throttle(n)
+        return n
+
+def __output_file_name(file_name, partition_key, output_format):
+    # Local name of a transformed file: the name without its .csv.gz/.csv extension
+    # plus that of output_format. Parquet files go into partition_key=... folders
+    # like the datasets of convert_to_parquet.
+    for extension in (".csv.gz", ".csv"):
+        if file_name.endswith(extension):
+            file_name = file_name[:-len(extension)]
+            break
+    file_name = file_name + "." + output_format
+    if output_format == 'parquet':
+        key = partition_key if partition_key is not None and not pd.isna(partition_key) else DEFAULT_PARTITION
+        file_name = f"{PARTITION_COLUMN}={key}/{file_name}"
+    return file_name
+
+class _SchemaMismatch(Exception):
+    """
+    Values of a chunk do not fit the Parquet column types taken from the previous chunks.
+    """
+    def __init__(self, columns):
+        super().__init__(f"Values of columns {columns} do not fit the types of the first chunk")
+        self.columns = columns
+
+def __parquet_table(pa, df, schema):
+    # Arrow table of a chunk in the schema of the file, or a new schema for the first chunk.
+    # Columns empty in the first chunk are typed as strings, so later values of any type fit.
+    if schema is None:
+        empty = set(df.columns[df.isna().all()]) if len(df) > 0 else set()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        schema = pa.schema([field.with_type(pa.string())
+                            if pa.types.is_null(field.type) or field.name in empty else field
+                            for field in table.schema])
+        return table.cast(schema)
+    df = df.assign(**{field.name: df[field.name].astype('string') for field in schema
+                      if pa.types.is_string(field.type) and not pd.api.types.is_string_dtype(df[field.name])})
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        failed = []
+        for field in schema:
+            try:
+                pa.array(df[field.name], type=field.type, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                failed.append(field.name)
+        raise _SchemaMismatch(failed)
+
+def __transform_file(client, link, dest_path, query, columns, output_format, chunksize,
+                     on_retry=None, stats=None):
+    # Stream, decompress and parse a file chunk by chunk, writing only the rows of
+    # query and the columns in columns to dest_path, so the raw file never touches disk.
+    # Returns the number of bytes received and the output file size.
+    # Parquet columns whose later values do not fit the types of the first chunk
+    # (e.g. text in a numeric column) are read as text, downloading the file again.
+    text_columns = []
+    while True:
+        try:
+            nbytes = __transform_stream(client, link, dest_path + ".part", query, columns, output_format,
+                                        chunksize, text_columns, on_retry, stats)
+            break
+        except _SchemaMismatch as e:
+            if not set(e.columns) - set(text_columns):
+                raise
+            print(f"{e}. Downloading {link} again with them as text.")
+            sys.stdout.flush()
+            text_columns = text_columns + e.columns
+
+    os.replace(dest_path + ".part", dest_path)
+    return nbytes, os.path.getsize(dest_path)
+
+def __transform_stream(client, link, part_path, query, columns, output_format, chunksize,
+                       text_columns, on_retry, stats):
+    # One pass of __transform_file, writing part_path. Returns the number of bytes received.
+    columns = None if columns is None else list(columns)
+
+    def usecols(column):
+        # Output columns plus those the query needs
+        return column in columns or len(_query_columns(query, [column])) > 0
+
+    limiter = client.limiter
+    writer = None
+    try:
+        with limiter.transfer_slot():
+            requested = time.perf_counter()
+            with client.get(link, stream=True, on_retry=on_retry) as response:
+                if stats is not None:
+                    stats['latency'] = time.perf_counter() - requested
+                response.raise_for_status()
+                response.raw.decode_content = True
+                response.raw.auto_close = False
+                body = _ThrottledStream(response.raw, limiter)
+                stream = BufferedReader(body, buffer_size=DOWNLOAD_CHUNK_SIZE)
+                if stream.peek(2)[:2] == GZIP_MAGIC:
+                    stream = gzip.GzipFile(fileobj=stream)
+                reader = pd.read_csv(stream, usecols=None if columns is None else usecols,
+                                     dtype={column: str for column in text_columns} or None,
+                                     chunksize=chunksize)
+                with reader:
+                    for chunk in reader:
+                        df = _filter_chunk(chunk, query, columns)
+                        if output_format == 'parquet':
+                            pa = _import_pyarrow()
+                            table = __parquet_table(pa, df, None if writer is None else writer.schema)
+                            if writer is None:
+                                writer = pa.parquet.ParquetWriter(part_path, table.schema, compression='zstd')
+                            writer.write_table(table)
+                        else:
+                            if writer is None:
+                                writer = gzip.open(part_path, 'wt', newline='') if output_format == 'csv.gz' \
+                                    else open(part_path, 'w', newline='')
+                                df.to_csv(writer, index=False)
+                            else:
+                                df.to_csv(writer, header=False, index=False)
+        if writer is None:
+            raise IOError(f"No data read from {link}")
+        writer.close()
+    except Exception:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return body.nbytes
+
+def __download_job(client, job, dest_folder, filename_prefix, skip_exists, resume,
+                   manifest, progress, metrics, verbose=True, transform=None):
+    # Download one file of a file list. job is a files_df row as a dict
+    # plus 'number', the position of the file in the whole download.
+    # transform, if given, holds the query, columns, output_format and chunksize
+    # applied while the file is received.
+    print(f"Downloading {job['number']}/{progress.num_files} (file index = {job['index']})")
+
+    file_name = filename_prefix + job['file_name']
+    partition_key = job.get('partition_key')
+    expected_size = None
+    if job.get('file_size_bytes') is not None and not pd.isna(job['file_size_bytes']):
+        expected_size = int(job['file_size_bytes'])
+    if transform is not None:
+        file_name = __output_file_name(file_name, partition_key, transform['output_format'])
+        os.makedirs(os.path.dirname(dest_folder + file_name), exist_ok=True)
+    dest_path = dest_folder + file_name
+
+    if os.path.exists(dest_path) and skip_exists:
+        size = os.path.getsize(dest_path)
+        # The size of a transformed file is not known in advance
+        if expected_size is None or size == expected_size or transform is not None:
+            print(f"File already exists: {dest_path}")
+            print(f"Skipping...")
+            if manifest.get(file_name).get('status') != 'completed':
+                manifest.update(file_name, link=job['link'],
+                                partition_key=partition_key,
+                                expected_size=expected_size, bytes_written=size,
+                                status='completed')
+            metrics.file_finished(file_name, job['link'], 'skipped', size=size)
+            print(progress.update(size, skipped=True))
+            sys.stdout.flush()
+            return
+        print(f"File exists but its size {size:,} does not match {expected_size:,} bytes: {dest_path}")
+
+    print(f"Writing {dest_path}")
+    if verbose:
+        print("Please be patient. It may take a while...")
+    sys.stdout.flush()
+
+    manifest.update(file_name, link=job['link'],
+                    partition_key=partition_key,
+                    expected_size=expected_size, bytes_written=0,
+                    status='downloading')
+    metrics.file_started(file_name, job['link'])
+    stats = {'retries': 0, 'latency': None}
+    started = time.perf_counter()
+
+    def on_retry(attempt, error):
+        stats['retries'] += 1
+        metrics.file_retry(file_name, job['link'], attempt, error)
+
+    attempt = 0
+    while True:
+        try:
+            if transform is None:
+                nbytes, size = __download_file(client, job['link'], dest_path,
+                                               expected_size, resume or attempt > 0,
+                                               on_retry=on_retry, stats=stats)
+            else:
+                # Starts over on retries, as the output cannot be resumed
+                nbytes, size = __transform_file(client, job['link'], dest_path,
+                                                on_retry=on_retry, stats=stats, **transform)
+            break
+        except Exception as e:
+            # A connection dropped in the middle of the transfer is resumed
+            # from the .part file written so far.
+            retry = isinstance(e, RETRYABLE_TRANSFER_ERRORS)
+            if retry and attempt < client.max_retries:
+                print(f"Retrying {file_name} after error: {e}")
+                sys.stdout.flush()
+                on_retry(attempt, e)
+                time.sleep(client.backoff(attempt))
+                attempt += 1
+                continue
+            part_path = dest_path + ".part"
+            manifest.update(file_name, status='failed',
+                            bytes_written=os.path.getsize(part_path) if os.path.exists(part_path) else 0)
+            metrics.file_finished(file_name, job['link'], 'failed',
+                                  seconds=time.perf_counter() - started, latency=stats['latency'],
+                                  retries=stats['retries'], error=e)
+            raise
+    manifest.update(file_name, bytes_written=size, status='completed')
+    metrics.file_finished(file_name, job['link'], 'completed', nbytes, size,
+                          time.perf_counter() - started, stats['latency'], stats['retries'])
+    print(progress.update(nbytes))
+    print(f"   ")
+    sys.stdout.flush()
+
+def __make_transform(query, columns, output_format, chunksize):
+    # Settings of __transform_file, or None to save files as downloaded
+    if query is None and columns is None and output_format is None:
+        return None
+    if output_format is None:
+        output_format = 'csv'
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, not {output_format!r}.")
+    if output_format == 'parquet':
+        _import_pyarrow()
+    return {'query': query, 'columns': columns, 'output_format': output_format,
+            'chunksize': chunksize}
+
+def _prepare_dest_folder(dest_folder):
+    dest_folder = dest_folder.replace("\\", "/")
+    if (not (dest_folder.endswith("/"))):
+        dest_folder = dest_folder + "/"
+    os.makedirs(dest_folder, exist_ok=True)
+    return dest_folder
+
 # Download files from file list to a destination folder
-def download_files(files_df, dest_folder, filename_prefix=None, skip_exists=False):
+def download_files(files_df, dest_folder, filename_prefix=None, skip_exists=False,
+                   num_workers=1, resume=True, metrics=None,
+                   query=None, columns=None, output_format=None, chunksize=100000):
     """
     Download files from file list to a destination folder.
 
     :param files_df: File list collected from get_file_list.
     :param dest_folder: Destination local folder to save files.
     :param filename_prefix: Prefix for file names.
-    :param skip_exists: Skips downloading if the file. Default is True.
-    :return: void.
+    :param skip_exists: Skips downloading if the file exists and its size matches file_size_bytes. Default is False.
+    :param num_workers: Number of files downloaded concurrently over a shared pooled
+        connection. Default is 1 (one file at a time).
+    :param resume: Resumes partially downloaded (.part) files from where they stopped. Default is True.
+    :param metrics: DownloadMetrics object to record into, e.g. one also passed to get_file_list. Default is None (a new one).
+    :param query: String containing query the columns of a pandas DataFrame with a boolean expression, applied while downloading. Default is None, which indicates all rows.
+    :param columns: Subset of columns to keep while downloading. Default is None, which indicates all columns.
+    :param output_format: Format of the filtered files, 'csv', 'csv.gz' or 'parquet' (requires pyarrow). Default is None ('csv' if query or columns is given, otherwise the files are saved as downloaded).
+    :param chunksize: Number of rows filtered at a time with query, columns or output_format. Default is 100000.
+    :return: A DownloadMetrics object with the timings of the download.
     """
-    dest_folder = dest_folder.replace("\\", "/")
-    if (not (dest_folder.endswith("/"))):
-        dest_folder = dest_folder + "/"
+    transform = __make_transform(query, columns, output_format, chunksize)
+    dest_folder = _prepare_dest_folder(dest_folder)
+    if metrics is None:
+        metrics = DownloadMetrics()
 
     if filename_prefix is None:
         filename_prefix = ""
 
+    manifest = _DownloadManifest(dest_folder)
+
     files_df.reset_index(drop=True, inplace=True)
 
     # number of files
     num_files = files_df.shape[0]
 
-    for i in range(0, num_files):
-        print(f"Downloading {i + 1}/{num_files} (file index = {files_df['index'][i]})")
+    num_workers = max(1, int(num_workers))
+    client = get_client()
+    client.ensure_pool_size(num_workers)
 
-        file_name = filename_prefix + files_df['file_name'][i]
-        dest_path = dest_folder + file_name
+    total_bytes = None
+    if 'file_size_bytes' in files_df.columns:
+        total_bytes = int(files_df['file_size_bytes'].sum())
+    progress = _DownloadProgress(num_files, total_bytes)
 
-        if os.path.exists(dest_path) and skip_exists:
-            print(f"File already exists: {dest_path}")
-            print(f"Skipping...")
-            continue
-
-        print(f"Writing {dest_path}")
-        print("Please be patient. It may take a while...")
-        sys.stdout.flush()
+    jobs = files_df.to_dict('records')
+    for i, job in enumerate(jobs):
+        job['number'] = i + 1
 
-        response = requests.get(files_df['link'][i])
-        open(dest_path, 'wb').write(response.content)
-        print(f"   ")
-        sys.stdout.flush()
+    if num_workers == 1:
+        # A failed file is recorded in the manifest and metrics, and the others continue
+        for job in jobs:
+            try:
+                __download_job(client, job, dest_folder, filename_prefix, skip_exists, resume,
+                               manifest, progress, metrics, transform=transform)
+            except Exception as e:
+                print(f"Error downloading {job['file_name']}: {e}")
+                sys.stdout.flush()
+        return metrics
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = {executor.submit(__download_job, client, job, dest_folder, filename_prefix,
+                                   skip_exists, resume, manifest, progress, metrics, False,
+                                   transform): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error downloading {futures[future]['file_name']}: {e}")
+                sys.stdout.flush()
+    return metrics
 
 
 def download_files0(apikey, product_path, dest_folder,
                     start_date=None, end_date=None,
-                    filename_prefix=None, skip_exists=False):
+                    filename_prefix=None, skip_exists=False, num_workers=1, metrics=None):
     """
     Download files with API key and product path to a destination folder.
 
@@ -351,30 +923,42 @@ def download_files0(apikey, product_path, dest_folder,
     :param end_date: Data end date character for files in the form of '2023-08-21'. Default is None ('9999-12-31'), which indicates no limit.
     :param filename_prefix: Prefix for file names.
     :param skip_exists: Prefix for file names. Skips downloading if the file exists. Default is True.
-    :return:
+    :param num_workers: Number of files downloaded concurrently. Default is 1.
+    :param metrics: DownloadMetrics object to record into. Default is None (a new one).
+    :return: A DownloadMetrics object with the timings of the listing and download.
     """
+    if metrics is None:
+        metrics = DownloadMetrics()
     files_df = get_file_list(apikey, product_path,
                              start_page=1, end_page=float('inf'),
                              start_date=start_date, end_date=end_date,
-                             print_info=True)
+                             print_info=True, metrics=metrics)
     # print("   ")
     print("Start downloading...")
     print(" ")
 
     if files_df is not None and files_df.shape[0] > 0:
-        download_files(files_df, dest_folder, filename_prefix, skip_exists)
+        download_files(files_df, dest_folder, filename_prefix, skip_exists, num_workers,
+                       metrics=metrics)
     else:
         print("No files to download.")
 
     print(" ")
     print("Download completed.")
+    return metrics
 
 def download_files1(apikey, product_path, dest_folder,
                     start_date=None, end_date=None,
-                    filename_prefix=None, skip_exists=False):
+                    filename_prefix=None, skip_exists=False, num_workers=1,
+                    queue_size=None, resume=True, metrics=None,
+                    query=None, columns=None, output_format=None, chunksize=100000):
     """
     Download files with API key and product path to a destination folder.
 
+    Pages of the file list are collected in a background thread while the files of
+    earlier pages are being downloaded. Collected links wait in a bounded queue, so
+    listing never runs far ahead of downloading and the links stay valid.
+
     :param apikey: API Key.
     :param product_path: API endpoint or Product ID.
     :param dest_folder: Destination local folder to save files.
@@ -382,39 +966,234 @@ def download_files1(apikey, product_path, dest_folder,
     :param end_date: Data end date character for files in the form of '2023-08-21'. Default is None ('9999-12-31'), which indicates no limit.
     :param filename_prefix: Prefix for file names.
     :param skip_exists: Prefix for file names. Skips downloading if the file exists. Default is True.
-    :return:
+    :param num_workers: Number of files downloaded concurrently. Default is 1.
+    :param queue_size: Maximum number of collected links waiting to be downloaded. Default is None (2 * num_workers).
+    :param resume: Resumes partially downloaded (.part) files from where they stopped. Default is True.
+    :param metrics: DownloadMetrics object to record into. Default is None (a new one).
+    :param query: String containing query the columns of a pandas DataFrame with a boolean expression, applied while downloading. Default is None, which indicates all rows.
+    :param columns: Subset of columns to keep while downloading. Default is None, which indicates all columns.
+    :param output_format: Format of the filtered files, 'csv', 'csv.gz' or 'parquet' (requires pyarrow). Default is None ('csv' if query or columns is given, otherwise the files are saved as downloaded).
+    :param chunksize: Number of rows filtered at a time with query, columns or output_format. Default is 100000.
+    :return: A DownloadMetrics object with the timings of the listing and download.
     """
 
+    transform = __make_transform(query, columns, output_format, chunksize)
+    product_path = _make_api_endpoint(product_path)
+    if metrics is None:
+        metrics = DownloadMetrics()
+
     # Get meta data
     meta = get_meta(apikey, product_path, print_meta=False)
+    if meta is None:
+        return None
+
+    params_ = _file_list_params(meta, start_date, end_date)
 
-    # Call get_file_list with meta for the first page to see the total_pages
-    p1_files_df, p1_selection_meta, p1_pages_meta = \
-        get_file_list_full(apikey=apikey, product_path=product_path,
-                                start_page=1, end_page=1,
-                                start_date=start_date, end_date=end_date,
-                                meta=meta,
-                                print_info=False)
-    print_selection_meta(p1_selection_meta, p1_pages_meta)
+    num_workers = max(1, int(num_workers))
+    if queue_size is None:
+        queue_size = 2 * num_workers
+    client = get_client()
+    client.ensure_pool_size(num_workers)
 
-    selection_meta = p1_selection_meta
+    # Get the first page to see the total_pages
+    started = time.perf_counter()
+    p1_json = __fetch_file_page(client, apikey, product_path, 1, params_, metrics)
+    if p1_json is None:
+        return None
+    metrics.record_listing(time.perf_counter() - started)
+    p1_files_df, p1_pages_meta = _assemble_file_list({1: p1_json})
+    selection_meta = _selection_meta(p1_json)
+    print_selection_meta(selection_meta, p1_pages_meta)
+
+    total_pages = int(selection_meta['total_pages'][0])
+
+    if filename_prefix is None:
+        filename_prefix = ""
+    dest_folder = _prepare_dest_folder(dest_folder)
+    manifest = _DownloadManifest(dest_folder)
+    progress = _DownloadProgress(int(selection_meta['total_files'][0]),
+                                 int(selection_meta['total_size_MB'][0] * 1000000))
+
+    jobs = queue.Queue(maxsize=max(1, int(queue_size)))
+    done = object()
+
+    def list_pages():
+        # Producer: collect the pages in order and queue their files
+        number = 0
+        try:
+            for i in range(1, total_pages + 1):
+                started = time.perf_counter()
+                res_json = p1_json if i == 1 else \
+                    __fetch_file_page(client, apikey, product_path, i, params_, metrics)
+                if i > 1:
+                    metrics.record_listing(time.perf_counter() - started)
+                if res_json is None:
+                    print(f"Could not collect page {i}/{total_pages}. Stopping.")
+                    break
+                print(" ")
+                print("Downloading page {}/{}...".format(i, total_pages))
+                sys.stdout.flush()
+                for link in res_json['download_links']:
+                    job = dict(link, page=i, index=number, number=number + 1)
+                    number += 1
+                    # Blocks while the queue is full
+                    jobs.put(job)
+        finally:
+            for _ in range(num_workers):
+                jobs.put(done)
+
+    def download_worker():
+        # Consumer: download queued files
+        while True:
+            job = jobs.get()
+            if job is done:
+                break
+            try:
+                __download_job(client, job, dest_folder, filename_prefix, skip_exists, resume,
+                               manifest, progress, metrics, num_workers == 1, transform)
+            except Exception as e:
+                print(f"Error downloading {job['file_name']}: {e}")
+                sys.stdout.flush()
 
     print(" ")
     print("Start downloading...")
-    for i in range(1, selection_meta['total_pages'][0] + 1):
+
+    producer = threading.Thread(target=list_pages, daemon=True)
+    producer.start()
+    workers = [threading.Thread(target=download_worker, daemon=True) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    producer.join()
+
+    print(" ")
+    print("Download completed.");
+    return metrics
+
+def __file_identity(partition_key, file_size_bytes, modified_at):
+    # File names are numbered within the requested date range and change when the
+    # range changes, so a file is identified by its partition, size and modification time.
+    return (partition_key, None if file_size_bytes is None else int(file_size_bytes), modified_at)
+
+def sync_files(apikey, product_path, dest_folder,
+               start_date=None, end_date=None,
+               filename_prefix=None, num_workers=1, remove_outdated=False):
+    """
+    Incrementally downloads new or changed files to a destination folder.
+
+    The first run downloads all files from start_date. Each run records the latest
+    synced partition_key and the files it downloaded in .dewey_sync.json in dest_folder.
+    The next run only lists files from that partition_key on and downloads the files
+    that are new or changed since.
+
+    :param apikey: API Key.
+    :param product_path: API endpoint or Product ID.
+    :param dest_folder: Destination local folder to save files.
+    :param start_date: Data start date character for the first sync in the form of '2021-07-01'. Default is None ("1000-01-01"), which indicates no limit.
+    :param end_date: Data end date character for files in the form of '2023-08-21'. Default is None ('9999-12-31'), which indicates no limit.
+    :param filename_prefix: Prefix for file names.
+    :param num_workers: Number of files downloaded concurrently. Default is 1.
+    :param remove_outdated: Deletes local files of the re-listed partitions that are no longer listed (replaced on the server). Default is False.
+    :return: A DataFrame object contains information of the files downloaded in this run.
+    """
+    product_path = _make_api_endpoint(product_path)
+    if filename_prefix is None:
+        filename_prefix = ""
+    dest_folder = _prepare_dest_folder(dest_folder)
+
+    meta = get_meta(apikey, product_path, print_meta=False)
+    if meta is None:
+        return None
+
+    state_path = dest_folder + SYNC_STATE_FILE_NAME
+    state = {'product_path': product_path, 'max_partition_key': None, 'files': {}}
+    if os.path.exists(state_path):
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+
+    window_start = start_date
+    if state['max_partition_key'] is not None and meta['partition_column'] is not None:
+        # List from the last synced partition on. It is listed again as files
+        # may have been added to it after the last run.
+        window_start = state['max_partition_key']
+        print(f"Last synced partition: {state['max_partition_key']}. "
+              f"Latest available partition: {meta['max_partition_key']}.")
+
+    files_df = get_file_list(apikey, product_path,
+                             start_date=window_start, end_date=end_date,
+                             meta=meta, print_info=True)
+    if files_df is None:
+        return None
+
+    # Several files of a partition can share the same size and modification time, so each
+    # synced file matches at most one listed file: the one with its name if listed, else any.
+    rows = files_df.to_dict('records')
+    identities = [__file_identity(row.get('partition_key'), row.get('file_size_bytes'), row.get('modified_at'))
+                  for row in rows]
+    known = {}
+    for name, f in state['files'].items():
+        known.setdefault(__file_identity(f['partition_key'], f['file_size_bytes'], f.get('modified_at')),
+                         set()).add(name)
+    is_new = [True] * len(rows)
+    matched = set()
+    for i, row in enumerate(rows):
+        name = filename_prefix + row['file_name']
+        if name in known.get(identities[i], ()):
+            known[identities[i]].remove(name)
+            matched.add(name)
+            is_new[i] = False
+    for i, row in enumerate(rows):
+        if is_new[i] and known.get(identities[i]):
+            matched.add(known[identities[i]].pop())
+            is_new[i] = False
+    new_df = files_df[is_new].reset_index(drop=True)
+
+    if remove_outdated and window_start is not None:
+        for name, f in list(state['files'].items()):
+            if name not in matched and f['partition_key'] is not None and f['partition_key'] >= window_start \
+                    and (end_date is None or f['partition_key'] <= end_date):
+                print(f"Removing outdated file: {dest_folder + name}")
+                if os.path.exists(dest_folder + name):
+                    os.remove(dest_folder + name)
+                del state['files'][name]
+
+    print(" ")
+    print(f"{new_df.shape[0]:,} new or changed files out of {files_df.shape[0]:,} listed files.")
+    if new_df.shape[0] > 0:
+        print("Start downloading...")
         print(" ")
-        print("Downloading page {}/{}...".format(i, selection_meta['total_pages'][0]))
+        download_files(new_df, dest_folder, filename_prefix, skip_exists=True, num_workers=num_workers)
+
+    # Record the downloaded files. Files that failed are listed again next time
+    # by keeping max_partition_key at or before their partition.
+    manifest = _DownloadManifest(dest_folder)
+    failed_keys = []
+    for row in new_df.to_dict('records'):
+        name = filename_prefix + row['file_name']
+        if manifest.get(name).get('status') == 'completed':
+            state['files'][name] = {'partition_key': row.get('partition_key'),
+                                    'file_size_bytes': row.get('file_size_bytes'),
+                                    'modified_at': row.get('modified_at')}
+        else:
+            failed_keys.append(row.get('partition_key'))
 
-        files_df = get_file_list(apikey=apikey, product_path=product_path,
-                                 start_page=i, end_page=i,
-                                 start_date=start_date, end_date=end_date,
-                                 meta=meta,
-                                 print_info=False)
+    listed_keys = [key for key in files_df.get('partition_key', []) if key is not None]
+    failed_keys = [key for key in failed_keys if key is not None]
+    if failed_keys:
+        state['max_partition_key'] = min(failed_keys)
+        print(f"{len(failed_keys):,} files failed and will be retried by the next sync.")
+    elif listed_keys:
+        state['max_partition_key'] = max(listed_keys + [state['max_partition_key'] or listed_keys[0]])
 
-        download_files(files_df, dest_folder, filename_prefix, skip_exists)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, state_path)
 
     print(" ")
-    print("Download completed.");
+    print("Sync completed.")
+    return new_df
 
 def slice_files_df(files_df, start_date, end_date=None):
     """
@@ -436,28 +1215,232 @@ def slice_files_df(files_df, start_date, end_date=None):
     return sliced_df
 
 
-def read_local(path, nrows=None):
+def read_local(path, nrows=None, dtype=None):
     """
     Read local data into memory from a path
 
     :param path: Path to a .csv.gz or csv file.
     :param nrows: Number of rows to read. Default is None (all).
+    :param dtype: Column types from infer_dtypes, or 'infer' to infer them from the file. Default is None (pandas defaults).
     :return: A DataFrame object contains data.
     """
-    df = pd.read_csv(path, nrows=nrows)
-    return df
+    if isinstance(dtype, str) and dtype == 'infer':
+        dtype = infer_dtypes(path)
+    df = pd.read_csv(path, nrows=nrows, dtype=_category_dtypes(dtype))
+    return _apply_dtypes(df, dtype)
 
 # Backward compatibility
 read_local_data = read_local
 
-def filter_data(data_folder, output_path, query=None, columns=None):
+# Dates like 2023-09-04 or 2023-09-04T00:00:00-04:00
+DATE_PATTERN = r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?$'
+
+def infer_dtypes(sources, nrows=10000, max_category_ratio=0.5, max_categories=10000):
+    """
+    Infers compact column types from a sample of one or more files, for read_local,
+    filter_data and DeweyDataset.
+
+    Repetitive text columns (brands, cities, states) become 'category', integer
+    columns 'integer' (downcast to the smallest integer type), float columns whose
+    sampled values float32 reproduces exactly 'float', and ISO date columns 'datetime'.
+    Other columns keep the pandas defaults. Integers and floats are narrowed per file
+    after reading, only as far as every value of the file allows, so values outside
+    the sampled range are never truncated, and a column with values that cannot be
+    converted is left as read.
+
+    :param sources: A file URL, a local file path, a DataFrame, or a list of them.
+    :param nrows: Number of rows sampled from each file. Default is 10000.
+    :param max_category_ratio: Maximum share of distinct values of a text column to make it a category. Default is 0.5.
+    :param max_categories: Maximum number of distinct values of a category column. Default is 10000.
+    :return: A dictionary of column name to 'category', 'integer', 'float' or 'datetime'.
+    """
+    if isinstance(sources, (str, pd.DataFrame)):
+        sources = [sources]
+    samples = []
+    for source in sources:
+        if isinstance(source, pd.DataFrame):
+            samples.append(source.head(nrows))
+        elif source.startswith(("https://", "http://")):
+            samples.append(read_sample(source, nrows=nrows))
+        else:
+            samples.append(pd.read_csv(source, nrows=nrows))
+    samples = [sample for sample in samples if sample is not None]
+    if not samples:
+        return {}
+    sample = pd.concat(samples, ignore_index=True)
+
+    dtypes = {}
+    for column in sample.columns:
+        values = sample[column].dropna()
+        if values.shape[0] == 0 or pd.api.types.is_bool_dtype(values):
+            continue
+        if pd.api.types.is_integer_dtype(values):
+            dtypes[column] = 'integer'
+        elif pd.api.types.is_float_dtype(values):
+            if __float32_exact(values):
+                dtypes[column] = 'float'
+        elif pd.api.types.is_string_dtype(values) or values.dtype == object:
+            values = values.astype(str)
+            if values.str.match(DATE_PATTERN).all():
+                dtypes[column] = 'datetime'
+            else:
+                distinct = values.nunique()
+                if distinct <= max_categories and distinct <= max_category_ratio * values.shape[0]:
+                    dtypes[column] = 'category'
+    return dtypes
+
+def __float32_exact(values):
+    # True when float32 reproduces every value as written, e.g. 1.25 or 0.1
+    # but not 40.7127753 (float32 has about 7 significant digits)
+    values = values.dropna()
+    return bool((pd.to_numeric(values.astype('float32').astype(str)) == values).all())
+
+def _category_dtypes(dtype):
+    # Categories are built by the csv parser, other types after reading
+    if dtype is None:
+        return None
+    return {column: 'category' for column, kind in dtype.items() if kind == 'category'}
+
+def _apply_dtypes(df, dtype):
+    # Converts the columns of df to the types from infer_dtypes (or any pandas type)
+    if dtype is None:
+        return df
+    for column, kind in dtype.items():
+        if column not in df.columns or kind == 'category':
+            continue
+        try:
+            df[column] = __convert_column(df[column], kind)
+        except (ValueError, TypeError, OverflowError):
+            # Values not seen in the sample (e.g. text in an integer column)
+            # leave the column as read
+            pass
+    return df
+
+def __convert_column(series, kind):
+    if kind == 'integer':
+        return pd.to_numeric(series, downcast='integer')
+    elif kind == 'float':
+        values = pd.to_numeric(series)
+        # float64 when any value of the file needs it
+        return values.astype('float32') if __float32_exact(values) else values
+    elif kind == 'datetime':
+        try:
+            return pd.to_datetime(series, format='ISO8601')
+        except ValueError:
+            # Mixed time zone offsets. Values that are not dates still raise.
+            return pd.to_datetime(series, format='ISO8601', utc=True)
+    return series.astype(kind)
+
+def _concat_frames(frames):
+    # pd.concat that keeps category columns as categories when the files
+    # have different categories (which pd.concat would turn into text).
+    frames = list(frames)
+    for column in frames[0].columns:
+        if not all(column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype)
+                   for frame in frames):
+            continue
+        categories = pd.Index(pd.unique(pd.concat(
+            [frame[column].cat.categories.to_series() for frame in frames], ignore_index=True)))
+        categorical = pd.CategoricalDtype(categories)
+        frames = [frame.assign(**{column: frame[column].astype(categorical)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def _query_columns(query, all_columns):
+    # Columns referenced in a DataFrame.query expression
+    if query is None:
+        return []
+    names = set(re.findall(r'`([^`]*)`', query))
+    # Drop quoted names and string literals before looking for identifiers
+    stripped = re.sub(r'`[^`]*`|"[^"]*"|\'[^\']*\'', ' ', query)
+    names.update(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', stripped))
+    return [column for column in all_columns if column in names]
+
+def __filter_usecols(file_path, query, columns):
+    # Columns to read from a file: the output columns plus those the query needs.
+    # None reads all columns.
+    if columns is None:
+        return None
+    header = pd.read_csv(file_path, nrows=0).columns
+    needed = set(columns) | set(_query_columns(query, header))
+    return [column for column in header if column in needed]
+
+def _filter_chunk(df, query, columns):
+    df = df if query is None else df.query(query)
+    df = df if columns is None else df[columns]
+    return df
+
+def __read_filter_chunks(file_path, query, columns, chunksize, dtype=None):
+    usecols = __filter_usecols(file_path, query, columns)
+    if chunksize is None:
+        chunks = [pd.read_csv(file_path, usecols=usecols, dtype=_category_dtypes(dtype))]
+    else:
+        chunks = pd.read_csv(file_path, usecols=usecols, dtype=_category_dtypes(dtype), chunksize=chunksize)
+    return (_apply_dtypes(chunk, dtype) for chunk in chunks)
+
+def __filter_file_to_part(file_path, part_path, query, columns, chunksize, dtype=None):
+    # Process pool worker: filters one file into its own csv file.
+    # Returns an error message or None.
+    try:
+        chunks = __read_filter_chunks(file_path, query, columns, chunksize, dtype)
+    except Exception as e:
+        return f"Error reading {file_path}: {e}"
+    try:
+        header = True
+        with open(part_path, 'w', newline='') as output:
+            for chunk in chunks:
+                _filter_chunk(chunk, query, columns).to_csv(output, header=header, index=False)
+                header = False
+    except Exception as e:
+        return f"Error processing {file_path}: {e}"
+    return None
+
+def __append_part(output, part_path, header):
+    # Appends a filtered file to the merged output. Columns are aligned by name to the
+    # header of the first file: missing columns are left empty and extra ones dropped.
+    # Returns the header line of the output.
+    with open(part_path, 'rb') as part:
+        first_line = part.readline()
+        if not first_line:
+            return header
+        if header is None:
+            output.write(first_line)
+            header = first_line
+        if first_line == header:
+            shutil.copyfileobj(part, output)
+            return header
+
+    columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+    part_columns = pd.read_csv(part_path, nrows=0).columns
+    dropped = [column for column in part_columns if column not in columns]
+    if dropped:
+        print(f"Dropping columns not in the first file: {dropped}")
+    # Read as text so values are written back unchanged
+    for chunk in pd.read_csv(part_path, dtype=str, keep_default_na=False, chunksize=100000):
+        chunk.reindex(columns=columns, fill_value='').to_csv(output, header=False, index=False, mode='wb')
+    return header
+
+def __natural_key(file_name):
+    # Sorts 'data-2-...' before 'data-10-...'
+    return [int(token) if token.isdigit() else token for token in re.split(r'(\d+)', file_name)]
+
+def filter_data(data_folder, output_path, query=None, columns=None, chunksize=None, num_workers=1,
+                dtype=None):
     """
     Filters data as each file is read and merges them into a single csv file based on query and columns input.
 
+    Filtered rows are appended to the output as they are produced, so memory use is bounded
+    by one file (or one chunk with chunksize) rather than by the whole result. When columns is
+    given, only those columns and the columns used in query are read.
+    Files are merged in file name order (file number order for downloaded files).
+    Columns are matched by name to those of the first file, and a file that fails is left out entirely.
+
     :param data_folder: Folder where user has the downloaded files.
     :param ouput_path: File path for final file output.
     :param query: String containing query the columns of a pandas DataFrame with a boolean expression. Default is None, which indicates all rows.
     :param columns: Subset of columns to take from the DataFrame. Default is None, which indicates all columns.
+    :param chunksize: Number of rows read at a time from each file. Default is None, which reads a whole file at a time.
+    :param num_workers: Number of processes filtering files in parallel. Default is 1.
+    :param dtype: Column types from infer_dtypes, or 'infer' to infer them from the first files, applied before query. Only 'category' and 'integer' columns are converted, so values are written as read. Default is None (pandas defaults).
     """
 
     try:
@@ -467,29 +1450,73 @@ def filter_data(data_folder, output_path, query=None, columns=None):
         files = [file for file in os.listdir(data_folder) if file.endswith(".csv.gz") or file.endswith(".csv")]
         if not files:
             raise FileNotFoundError(f"No CSV files found in {data_folder}")
-   
-        df_list = []
-        for i, file in enumerate(files):
-            print(f"Processing File {i+1}/{len(files)}")
-            file_path = os.path.join(data_folder, file)
-            try: 
-                df = pd.read_csv(file_path)
-            except Exception as e:
-                print(f"Error reading {file_path}: {e}")
-                continue
-
-            try:
-                df = df if query is None else df.query(query)
-                df = df if columns is None else df[columns]
-                df_list.append(df)
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
-                continue
-        df = pd.concat(df_list, ignore_index=True)
+        files.sort(key=__natural_key)
+
+        if isinstance(dtype, str) and dtype == 'infer':
+            dtype = infer_dtypes([os.path.join(data_folder, file) for file in files[:3]])
+        if dtype is not None:
+            # Floats and dates would be written back rounded or reformatted
+            dtype = {column: kind for column, kind in dtype.items() if kind in ('category', 'integer')}
+
+        if num_workers > 1:
+            __filter_data_parallel(data_folder, files, output_path, query, columns, chunksize, num_workers,
+                                   dtype)
+            return
+
+        # Each file is filtered into its own part first, so a file that fails
+        # partway through leaves nothing in the output, as with num_workers > 1.
+        part_path = output_path + ".part"
+        file_part_path = output_path + ".file.part"
+        header = None
+        try:
+            with open(part_path, 'wb') as output:
+                for i, file in enumerate(files):
+                    print(f"Processing File {i+1}/{len(files)}")
+                    error = __filter_file_to_part(os.path.join(data_folder, file), file_part_path,
+                                                  query, columns, chunksize, dtype)
+                    if error is not None:
+                        print(error)
+                        continue
+                    header = __append_part(output, file_part_path, header)
+        finally:
+            if os.path.exists(file_part_path):
+                os.remove(file_part_path)
 
         print(f"Saving merged data to {output_path}...") # print the path where the merged data will be saved
-        df.to_csv(output_path, index=False) # save the merged data to a CSV file
+        os.replace(part_path, output_path)
         print("Done!")
 
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
+
+def __filter_data_parallel(data_folder, files, output_path, query, columns, chunksize, num_workers,
+                           dtype=None):
+    # Each worker process filters whole files into separate csv files,
+    # which are then concatenated in file order.
+    part_dir = tempfile.mkdtemp(prefix=".filter_data_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        part_paths = [os.path.join(part_dir, f"{i}.csv") for i in range(len(files))]
+        errors = {}
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(__filter_file_to_part, os.path.join(data_folder, file),
+                                       part_paths[i], query, columns, chunksize, dtype): i
+                       for i, file in enumerate(files)}
+            for n, future in enumerate(as_completed(futures)):
+                i = futures[future]
+                print(f"Processed File {n+1}/{len(files)} ({files[i]})")
+                sys.stdout.flush()
+                errors[i] = future.result()
+                if errors[i] is not None:
+                    print(errors[i])
+
+        print(f"Saving merged data to {output_path}...") # print the path where the merged data will be saved
+        header = None
+        with open(output_path + ".part", 'wb') as output:
+            for i, part_path in enumerate(part_paths):
+                if errors[i] is not None:
+                    continue
+                header = __append_part(output, part_path, header)
+        os.replace(output_path + ".part", output_path)
+        print("Done!")
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
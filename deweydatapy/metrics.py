@@ -0,0 +1,202 @@
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+# Structured events are logged at DEBUG level, e.g.
+# logging.getLogger("deweydatapy").setLevel(logging.DEBUG)
+logger = logging.getLogger("deweydatapy")
+
+FILE_METRICS_COLUMNS = ['file_name', 'host', 'status', 'bytes', 'size', 'seconds',
+                        'latency', 'throughput_MBps', 'retries', 'error']
+
+class DownloadMetrics:
+    """
+    Timings of a file listing and download: bytes, latency (time to the first
+    response), throughput and retries of each file, and time spent listing
+    pages versus transferring files.
+
+    Each step is also reported as an event dictionary to callback (called from
+    the download threads) and to the "deweydatapy" logger at DEBUG level.
+    Events are page_listed, listing_completed, file_started, file_retry,
+    file_completed, file_skipped and file_failed.
+
+    Example:
+        metrics = ddp.DownloadMetrics()
+        files_df = ddp.get_file_list(apikey, product_path, metrics=metrics)
+        ddp.download_files(files_df, "C:/Temp", num_workers=8, metrics=metrics)
+        metrics.print_summary()
+        metrics.by_host()
+    """
+    def __init__(self, callback=None):
+        """
+        :param callback: Function called with each event dictionary. Default is None.
+        """
+        self.callback = callback
+        self.listing_seconds = 0.0
+        self.pages = 0
+        self.files = []
+        self.start_time = None
+        self.end_time = None
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        """
+        Reports an event to the callback and the logger.
+
+        :param event: Event name.
+        :param fields: Event fields.
+        """
+        fields = dict(event=event, time=time.time(), **fields)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s %s", event, json.dumps(fields, default=str),
+                         extra={'dewey_event': fields})
+        if self.callback is not None:
+            self.callback(fields)
+
+    def record_page(self, page, seconds):
+        """
+        :param page: Page number of the file list.
+        :param seconds: Duration of the page request.
+        """
+        with self.lock:
+            self.pages += 1
+        self.emit('page_listed', page=page, seconds=seconds)
+
+    def record_listing(self, seconds, pages=None):
+        """
+        :param seconds: Time spent collecting file list pages.
+        :param pages: Number of pages collected.
+        """
+        with self.lock:
+            self.listing_seconds += seconds
+        if pages is not None:
+            self.emit('listing_completed', pages=pages, seconds=seconds)
+
+    def file_started(self, file_name, link):
+        """
+        :param file_name: Local file name.
+        :param link: Download link.
+        """
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = time.time()
+        self.emit('file_started', file_name=file_name, host=urlparse(link).hostname)
+
+    def file_retry(self, file_name, link, attempt, error):
+        """
+        :param file_name: Local file name.
+        :param link: Download link.
+        :param attempt: Number of the failed attempt, starting at 0.
+        :param error: Description of the failure.
+        """
+        self.emit('file_retry', file_name=file_name, host=urlparse(link).hostname,
+                  attempt=attempt, error=str(error))
+
+    def file_finished(self, file_name, link, status, nbytes=0, size=None, seconds=0.0,
+                      latency=None, retries=0, error=None):
+        """
+        :param file_name: Local file name.
+        :param link: Download link.
+        :param status: 'completed', 'skipped' or 'failed'.
+        :param nbytes: Number of bytes transferred.
+        :param size: File size on disk.
+        :param seconds: Duration of the download including retries.
+        :param latency: Seconds until the first response of the last attempt.
+        :param retries: Number of retries.
+        :param error: Description of the failure.
+        """
+        record = {'file_name': file_name, 'host': urlparse(link).hostname, 'status': status,
+                  'bytes': nbytes, 'size': size, 'seconds': seconds, 'latency': latency,
+                  'throughput_MBps': nbytes / seconds / 1000000 if seconds > 0 else None,
+                  'retries': retries, 'error': None if error is None else str(error)}
+        with self.lock:
+            self.files.append(record)
+            if status != 'skipped':
+                self.end_time = time.time()
+        self.emit('file_' + status, **record)
+
+    def files_frame(self):
+        """
+        :return: A DataFrame object with one row per file.
+        """
+        import pandas as pd
+
+        with self.lock:
+            return pd.DataFrame(list(self.files), columns=FILE_METRICS_COLUMNS)
+
+    def summary(self):
+        """
+        :return: A dictionary of aggregate metrics.
+        """
+        df = self.files_frame()
+        transferred = df[df['status'] == 'completed']
+        nbytes = int(transferred['bytes'].sum())
+        transfer_seconds = 0.0
+        if self.start_time is not None and self.end_time is not None:
+            transfer_seconds = self.end_time - self.start_time
+        throughput = transferred['throughput_MBps'].dropna().astype(float)
+        latency = transferred['latency'].dropna().astype(float)
+        return {
+            'files': int(df.shape[0]),
+            'completed': int(transferred.shape[0]),
+            'skipped': int((df['status'] == 'skipped').sum()),
+            'failed': int((df['status'] == 'failed').sum()),
+            'bytes': nbytes,
+            'retries': int(df['retries'].sum()),
+            'pages': self.pages,
+            'listing_seconds': self.listing_seconds,
+            'transfer_seconds': transfer_seconds,
+            'throughput_MBps': nbytes / transfer_seconds / 1000000 if transfer_seconds > 0 else None,
+            'file_throughput_MBps_median': float(throughput.median()) if len(throughput) else None,
+            'file_throughput_MBps_p05': float(throughput.quantile(0.05)) if len(throughput) else None,
+            'latency_median': float(latency.median()) if len(latency) else None,
+            'latency_p95': float(latency.quantile(0.95)) if len(latency) else None,
+        }
+
+    def by_host(self):
+        """
+        Per-host aggregates, slowest first, to spot slow download servers.
+
+        :return: A DataFrame object with one row per host.
+        """
+        import pandas as pd
+
+        df = self.files_frame()
+        df = df[df['status'] != 'skipped']
+        if df.shape[0] == 0:
+            return pd.DataFrame(columns=['host', 'files', 'failed', 'bytes', 'retries',
+                                         'throughput_MBps', 'latency'])
+        df = df.assign(failed=df['status'] == 'failed',
+                       throughput_MBps=df['throughput_MBps'].astype(float),
+                       latency=df['latency'].astype(float))
+        hosts = df.groupby('host', dropna=False).agg(
+            files=('file_name', 'size'), failed=('failed', 'sum'), bytes=('bytes', 'sum'),
+            retries=('retries', 'sum'), throughput_MBps=('throughput_MBps', 'median'),
+            latency=('latency', 'median'))
+        return hosts.sort_values('throughput_MBps').reset_index()
+
+    def print_summary(self):
+        summary = self.summary()
+
+        def fmt(value, digits=2):
+            return "-" if value is None else round(value, digits)
+
+        print("\nDownload metrics ------------------------------------------------")
+        print(f"Files: {summary['files']:,} (completed {summary['completed']:,}, "
+              f"skipped {summary['skipped']:,}, failed {summary['failed']:,})")
+        print(f"Downloaded (MB): {round(summary['bytes'] / 1000000, 2):,}")
+        print(f"Listing: {summary['pages']:,} pages in {fmt(summary['listing_seconds'])} seconds")
+        print(f"Transfer: {fmt(summary['transfer_seconds'])} seconds, {fmt(summary['throughput_MBps'])} MB/s")
+        print(f"Per file MB/s: median {fmt(summary['file_throughput_MBps_median'])}, "
+              f"slowest 5% {fmt(summary['file_throughput_MBps_p05'])}")
+        print(f"Latency (seconds): median {fmt(summary['latency_median'], 3)}, "
+              f"95th percentile {fmt(summary['latency_p95'], 3)}")
+        print(f"Retries: {summary['retries']:,}")
+        print("-----------------------------------------------------------------\n")
+
+    def __repr__(self):
+        summary = self.summary()
+        return (f"DownloadMetrics({summary['completed']} completed, {summary['failed']} failed, "
+                f"{summary['bytes']:,} bytes, {summary['retries']} retries)")